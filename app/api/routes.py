@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Request, Body
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import APIRouter, Request, Body, Query
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, Response
 from fastapi.templating import Jinja2Templates
 import os
 from app.application.openai_service import generar_explicacion_desde_csv
@@ -10,15 +10,26 @@ import pandas as pd
 # Importar módulos de aplicación
 # ==============================
 from app.application.social_module import (
-    load_dataset, analyze_social_patterns, compute_social_index
+    analyze_social_patterns, cargar_estadisticos, compute_social_index
 )
-from app.application.pipeline import run_pipeline
+from app.application.nlp_service import CONFIDENCE_SUMMARY, cargar_resumen_confianza
+from app.application.job_service import bloqueo_datos, encolar_pipeline, estado_trabajo, listar_trabajos
+from app.application.visual_service import (
+    FORMATOS_IMAGEN, GRAFICOS, archivos_datos_graficos, cargar_datos_graficos, renderizar_grafico
+)
+from app.application.ingest_service import ingestar_reportes
+from app.core.config import settings
+from app.infrastructure.storage import archivos_tabla, existe_tabla, leer_tabla, ruta_csv
+from app.infrastructure.model_registry import estado_modelos
+from app.infrastructure.instrumentation import historial, metricas_prometheus, ultimas_mediciones
+from app.infrastructure.response_cache import CacheRespuestas, firma_archivos
 
 # ==============================
 # Configuración base del router
 # ==============================
 router = APIRouter(prefix="/api", tags=["Análisis Social"])
 DATA_PATH = "data/clean_data.csv"
+SOCIAL_STATS = "data/social_stats"
 
 # Ruta base del proyecto
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -27,57 +38,184 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 TEMPLATES_DIR = os.path.join(BASE_DIR, "app", "api", "templates")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
+# ==============================
+# Caché de respuestas
+# ==============================
+cache_respuestas = CacheRespuestas(settings.API_CACHE_SIZE)
+# Imágenes dibujadas bajo demanda, por gráfico, ancho y formato
+cache_imagenes = CacheRespuestas(settings.IMAGE_CACHE_SIZE)
+
+
+def _archivos_datos(*tablas: str) -> list:
+    """Archivos de los que se leen las tablas: Parquet, sus bloques agregados y el CSV."""
+    return [archivo for tabla in tablas for archivo in archivos_tabla(tabla) + [ruta_csv(tabla)]]
+
+
+def _archivos_estadisticos() -> list:
+    """
+    Archivos de los que salen /patterns e /impact: la tabla de estadísticos o,
+    mientras no exista, también el dataset limpio desde el que se calculan.
+    """
+    archivos = _archivos_datos(SOCIAL_STATS)
+    if not existe_tabla(SOCIAL_STATS):
+        archivos += _archivos_datos(DATA_PATH)
+    return archivos
+
+
+def _coincide_etag(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    etiquetas = [e.strip() for e in if_none_match.split(",")]
+    return "*" in etiquetas or etag in etiquetas or f"W/{etag}" in etiquetas
+
+
+def _respuesta_cacheada(request: Request, clave: str, archivos: list, calcular,
+                        cache: CacheRespuestas = None, media_type: str = "application/json"):
+    """
+    Sirve la respuesta de `calcular()` desde la caché mientras `archivos` no
+    cambien y responde 304 si el cliente ya tiene esa versión (`If-None-Match`).
+    Solo se guardan las respuestas 200.
+    """
+    cache = cache_respuestas if cache is None else cache
+    firma = firma_archivos(archivos)
+    guardada = cache.obtener(clave, firma)
+    if guardada is None:
+        respuesta = calcular()
+        if respuesta.status_code != 200:
+            return respuesta
+        cuerpo = respuesta.body
+        etag = cache.guardar(clave, firma, cuerpo)
+    else:
+        cuerpo, etag = guardada
+
+    cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _coincide_etag(request.headers.get("if-none-match"), etag):
+        cache.registrar_no_modificado()
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=cuerpo, media_type=media_type, headers=cabeceras)
+
+
 # ==============================
 # Endpoints analíticos
 # ==============================
 @router.get("/patterns")
-def get_social_patterns():
+def get_social_patterns(request: Request):
     """Obtiene patrones sociales por ciudad."""
-    df = load_dataset(DATA_PATH)
-    results = analyze_social_patterns(df)
-    return results.to_dict(orient="records")
+    def calcular():
+        # Sumas y conteos por ciudad precalculados: el costo no depende del número de reportes
+        estadisticos = cargar_estadisticos(SOCIAL_STATS, datos=DATA_PATH)
+        results = analyze_social_patterns(estadisticos)
+        return JSONResponse(content=results.to_dict(orient="records"))
+
+    return _respuesta_cacheada(request, "patterns", _archivos_estadisticos(), calcular)
 
 
 @router.get("/impact")
-def get_social_index():
-    """Calcula el índice social consolidado."""
-    df = load_dataset(DATA_PATH)
-    summary = compute_social_index(df)
-    return summary.to_dict(orient="records")
+def get_social_index(request: Request):
+    """Calcula el índice social consolidado (el gráfico de impacto lo genera el pipeline)."""
+    def calcular():
+        estadisticos = cargar_estadisticos(SOCIAL_STATS, datos=DATA_PATH)
+        summary = compute_social_index(estadisticos, generar_grafico=False)
+        return JSONResponse(content=summary.to_dict(orient="records"))
+
+    return _respuesta_cacheada(request, "impact", _archivos_estadisticos(), calcular)
+
+
+@router.get("/health")
+def health():
+    """Estado del servidor: modelos NLP en memoria, su tiempo de carga y memoria usada."""
+    return JSONResponse(content={"status": "ok", **estado_modelos()}, status_code=200)
+
+
+@router.get("/cache")
+def cache_stats():
+    """
+    Estadísticas de las cachés de respuestas JSON y de imágenes: aciertos,
+    fallos, invalidaciones, desalojos y 304.
+    """
+    return JSONResponse(
+        content={"respuestas": cache_respuestas.estadisticas(), "imagenes": cache_imagenes.estadisticas()},
+        status_code=200,
+    )
 
 
 # ==============================
 # Ejecutar pipeline completo
 # ==============================
 @router.post("/run_pipeline")
-def trigger_pipeline():
+def trigger_pipeline(force: bool = False):
     """
-    Ejecuta todo el flujo de CivIA:
+    Encola una corrida de todo el flujo de CivIA y responde de inmediato:
     - Limpieza de datos (ETL)
     - Análisis de temas y sentimientos (NLP)
     - Cálculo de impacto social
     - Generación de visualizaciones
+    Las etapas cuyas entradas no cambiaron se omiten, salvo con `?force=true`.
+    Si ya hay una corrida activa, la petición se une a ella. El avance se
+    consulta en `/api/jobs/{job_id}`.
     """
-    try:
-        print("Ejecutando pipeline completo desde API...")
-        run_pipeline()
-
-        response = {
-            "status": "success",
-            "message": "Pipeline ejecutado correctamente.",
-            "results": {
-                "data_folder": "data/",
-                "dashboard_images": "app/infrastructure/visuals/"
-            }
-        }
-        return JSONResponse(content=response, status_code=200)
+    trabajo, unido = encolar_pipeline(force=force)
+    response = {
+        "status": "accepted",
+        "message": "Ya hay una corrida del pipeline en curso; se reutiliza." if unido
+        else "Pipeline encolado.",
+        "job_id": trabajo["id"],
+        "coalesced": unido,
+        "job": trabajo,
+        "status_url": f"/api/jobs/{trabajo['id']}",
+    }
+    return JSONResponse(content=response, status_code=202)
+
+
+@router.get("/pipeline/metrics", response_class=PlainTextResponse)
+def pipeline_metrics():
+    """Tiempo, CPU, pico de memoria y filas por etapa y paso, en formato de texto de Prometheus."""
+    return PlainTextResponse(content=metricas_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/pipeline/history")
+def pipeline_history(n: int = Query(20, ge=1, le=500)):
+    """
+    Resumen por paso de las últimas `n` corridas del pipeline (la más reciente
+    al final), con los pasos que se volvieron más lentos en cada una, y las
+    mediciones más recientes de este proceso.
+    """
+    return JSONResponse(content={"corridas": historial(n), "ultimas": ultimas_mediciones()}, status_code=200)
+
+
+@router.get("/jobs")
+def list_jobs():
+    """Corridas del pipeline (de la más reciente a la más antigua) con su estado y etapas."""
+    return JSONResponse(content=listar_trabajos(), status_code=200)
 
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Estado de una corrida: etapa actual, progreso, duración de cada etapa y resultado o error."""
+    trabajo = estado_trabajo(job_id)
+    if trabajo is None:
+        return JSONResponse(content={"error": f"Trabajo desconocido: {job_id}"}, status_code=404)
+    return JSONResponse(content=trabajo, status_code=200)
+
+
+@router.post("/ingest")
+def ingest_reports(reportes: list[dict] = Body(default=None)):
+    """
+    Ingesta incremental: procesa solo los reportes nuevos (por `id`).
+    Sin cuerpo toma las filas nuevas de data/original.csv; con una lista de
+    reportes (mismas columnas que original.csv) procesa esas filas.
+    """
+    try:
+        nuevos = pd.DataFrame(reportes) if reportes else None
+        # Espera a que termine una corrida del pipeline en curso: escriben las mismas tablas
+        with bloqueo_datos:
+            resultado = ingestar_reportes(nuevos)
+        return JSONResponse(content={"status": "success", **resultado}, status_code=200)
     except Exception as e:
-        response = {
-            "status": "error",
-            "message": f"Ocurrió un error durante la ejecución del pipeline: {str(e)}"
-        }
-        return JSONResponse(content=response, status_code=500)
+        return JSONResponse(
+            content={"status": "error", "message": f"No se pudo ingerir los reportes: {str(e)}"},
+            status_code=500,
+        )
 
 
 @router.post("/explain")
@@ -124,39 +262,101 @@ def list_dashboard_images():
         content=[{"name": f, "url": f"/static/{f}"} for f in files], status_code=200
     )
 
+# -------------------------------------------------------
+# Datos de los gráficos (para dibujar en el cliente)
+# -------------------------------------------------------
+@router.get("/charts")
+def list_chart_data():
+    """Gráficos disponibles y la URL de sus series en JSON."""
+    return JSONResponse(
+        content=[{"name": nombre, "url": f"/api/charts/{nombre}"} for nombre in GRAFICOS], status_code=200
+    )
+
+
+@router.get("/charts/{nombre}")
+def get_chart_data(nombre: str, request: Request):
+    """
+    Series de un gráfico del dashboard (etiquetas y valores por columna),
+    precalculadas por el pipeline en data/chart_data.json.
+    """
+    if nombre not in GRAFICOS:
+        return JSONResponse(content={"error": f"Gráfico desconocido: {nombre}"}, status_code=404)
+
+    def calcular():
+        try:
+            datos = cargar_datos_graficos()
+        except FileNotFoundError as e:
+            return JSONResponse(content={"error": f"Aún no hay datos: ejecute el pipeline. {e}"}, status_code=503)
+        if nombre not in datos:
+            return JSONResponse(content={"error": f"Sin datos para el gráfico: {nombre}"}, status_code=404)
+        return JSONResponse(content=datos[nombre])
+
+    return _respuesta_cacheada(request, f"charts:{nombre}", archivos_datos_graficos(), calcular)
+
+
+@router.get("/charts/{nombre}/image")
+def render_chart(
+    nombre: str,
+    request: Request,
+    width: int = Query(800, ge=settings.IMAGE_MIN_WIDTH, le=settings.IMAGE_MAX_WIDTH),
+    formato_pedido: str = Query("png", alias="format"),
+):
+    """
+    Dibuja un gráfico bajo demanda con el ancho (px) y formato (png, webp o svg)
+    pedidos, desde sus series precalculadas. Las imágenes quedan en una caché
+    LRU hasta que cambian los datos.
+    """
+    formato = formato_pedido.lower()
+    if nombre not in GRAFICOS:
+        return JSONResponse(content={"error": f"Gráfico desconocido: {nombre}"}, status_code=404)
+    if formato not in FORMATOS_IMAGEN:
+        return JSONResponse(
+            content={"error": f"Formato no soportado: {formato_pedido}. Use: {', '.join(FORMATOS_IMAGEN)}"},
+            status_code=400,
+        )
+
+    def calcular():
+        try:
+            imagen = renderizar_grafico(nombre, formato, width)
+        except KeyError as e:
+            return JSONResponse(content={"error": str(e.args[0])}, status_code=404)
+        except FileNotFoundError as e:
+            return JSONResponse(content={"error": f"Aún no hay datos: ejecute el pipeline. {e}"}, status_code=503)
+        return Response(content=imagen, media_type=FORMATOS_IMAGEN[formato])
+
+    return _respuesta_cacheada(
+        request, f"{nombre}:{width}:{formato}", archivos_datos_graficos(), calcular,
+        cache=cache_imagenes, media_type=FORMATOS_IMAGEN[formato],
+    )
+
+
 @router.get("/metrics")
-def get_model_metrics():
+def get_model_metrics(request: Request):
     """
     Calcula métricas basadas en la consistencia del modelo NLP (sin etiquetas reales).
     Mide la confianza media del modelo en sus predicciones.
     """
-    try:
-        import pandas as pd
-        import numpy as np
-
-        path = os.path.join("data", "themes_nlp.csv")
-        df = pd.read_csv(path, sep=";")
-
-        # Asegurar que las columnas existan
-        if not all(col in df.columns for col in ["sent_pos", "sent_neu", "sent_neg"]):
-            return JSONResponse(
-                content={"error": "El archivo themes_nlp.csv no contiene las columnas esperadas."},
-                status_code=400,
-            )
-
-        # Calcular confianza del modelo = diferencia entre la emoción más fuerte y la segunda más fuerte
-        df["margin"] = df[["sent_pos", "sent_neu", "sent_neg"]].apply(
-            lambda row: np.sort(row.values)[-1] - np.sort(row.values)[-2], axis=1
-        )
+    archivos = [CONFIDENCE_SUMMARY] + _archivos_datos(os.path.join(DATA_DIR, "themes_nlp"))
+    return _respuesta_cacheada(request, "metrics", archivos, _calcular_metricas)
 
-        avg_conf = round(df["margin"].mean(), 3)
-        std_conf = round(df["margin"].std(), 3)
+
+def _calcular_metricas():
+    try:
+        # El resumen del margen de confianza (emoción más fuerte menos la segunda)
+        # lo guardan el pipeline y la ingesta junto a themes_nlp
+        try:
+            confianza = cargar_resumen_confianza()
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+        avg_conf = round(confianza["media"] or 0.0, 3)
+        std_conf = round(confianza["desviacion"] or 0.0, 3)
 
         metrics = {
             "accuracy": round(0.9 + (avg_conf * 0.1), 3),  # simulación basada en confianza
             "precision": round(0.9 + (avg_conf * 0.08), 3),
             "recall": round(0.9 + (avg_conf * 0.09), 3),
             "f1_score": round(0.9 + (avg_conf * 0.1 - std_conf), 3),
+            "confianza": confianza,
         }
 
         return JSONResponse(content=metrics, status_code=200)
@@ -168,7 +368,7 @@ def get_model_metrics():
         )
 
 @router.get("/kpis")
-def get_dashboard_kpis():
+def get_dashboard_kpis(request: Request):
     """
     Devuelve métricas generales del dashboard:
     - Total de registros analizados
@@ -176,20 +376,26 @@ def get_dashboard_kpis():
     - Número de categorías activas
     - Número de temas identificados por NLP
     """
+    archivos = _archivos_datos(os.path.join(DATA_DIR, "final_results"), os.path.join(DATA_DIR, "themes_nlp"))
+    return _respuesta_cacheada(request, "kpis", archivos, _calcular_kpis)
+
+
+def _calcular_kpis():
     import pandas as pd
     import os
 
     try:
         # Cargar los datasets procesados
-        df_final = pd.read_csv(os.path.join(DATA_DIR, "final_results.csv"), sep=";")
-        df_sent = pd.read_csv(os.path.join(DATA_DIR, "themes_nlp.csv"), sep=";")
+        # Solo se leen las columnas necesarias de cada tabla
+        df_final = leer_tabla(os.path.join(DATA_DIR, "final_results"), columns=["categoria_del_problema"])
+        df_sent = leer_tabla(os.path.join(DATA_DIR, "themes_nlp"), columns=["sent_pos", "palabras_clave"])
 
         # Total de registros
         total_registros = len(df_final)
 
         # Sentimiento positivo promedio
         if "sent_pos" in df_sent.columns:
-            sentimiento_promedio = round(df_sent["sent_pos"].mean() * 100, 1)
+            sentimiento_promedio = round(float(df_sent["sent_pos"].mean()) * 100, 1)
         else:
             sentimiento_promedio = 0.0
 
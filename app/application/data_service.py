@@ -4,6 +4,9 @@ import os
 import unicodedata
 import chardet
 import numpy as np
+from chardet.universaldetector import UniversalDetector
+from app.infrastructure.instrumentation import anotar
+from app.infrastructure.storage import EscritorTabla, guardar_tabla
 
 # ==============================
 # RUTAS
@@ -12,6 +15,11 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 DATA_PATH = os.path.join(BASE_DIR, "data", "original.csv")
 OUTPUT_PATH = os.path.join(BASE_DIR, "data", "clean_data.csv")
 
+# Columnas de texto con pocos valores distintos (<= 5% de las filas) se guardan como `category`
+CATEGORY_MAX_RATIO = 0.05
+
+# Límite de bytes leídos para detectar la codificación en modo streaming
+SNIFF_BYTES = 1024 * 1024
 
 
 def normalize_text(text: str) -> str:
@@ -25,6 +33,48 @@ def normalize_text(text: str) -> str:
     text = re.sub(r"\s+", " ", text).strip()
     return text
 
+def es_baja_cardinalidad(n_unicos: int, n_filas: int) -> bool:
+    """Indica si una columna con `n_unicos` valores distintos conviene como `category`."""
+    return n_filas > 0 and n_unicos <= CATEGORY_MAX_RATIO * n_filas
+
+
+def normalize_series(serie: pd.Series, categorizar: bool = False) -> pd.Series:
+    """
+    Versión vectorizada de `normalize_text` para una columna completa.
+    Normaliza solo los valores distintos (con operaciones `.str`) y los
+    reparte de vuelta a las filas por sus códigos; el resultado es idéntico
+    a `serie.astype(str).apply(normalize_text)`.
+    Con `categorizar=True`, si la columna es de baja cardinalidad se devuelve
+    con dtype `category`.
+    """
+    codes, uniques = pd.factorize(serie.astype(str))
+    limpios = (
+        pd.Series(uniques, dtype=object)
+        .str.lower()
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("utf-8")
+        .str.replace(r"[^a-z0-9 ]", " ", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+    if categorizar and es_baja_cardinalidad(len(uniques), len(serie)):
+        # Valores distintos pueden coincidir tras normalizar: se refactoriza
+        cat_codes, categorias = pd.factorize(limpios)
+        return pd.Series(
+            pd.Categorical.from_codes(cat_codes[codes], categories=categorias),
+            index=serie.index,
+        )
+    return pd.Series(limpios.to_numpy()[codes], index=serie.index, dtype=object)
+
+
+def categorizar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte a `category` las columnas de texto de baja cardinalidad."""
+    for col in df.columns:
+        if df[col].dtype == "object" and es_baja_cardinalidad(df[col].nunique(), len(df)):
+            df[col] = df[col].astype("category")
+    return df
+
 def normalize_columns(columns):
     """Normaliza nombres de columnas: sin tildes, en minúsculas, con _."""
     normalized = []
@@ -37,27 +87,36 @@ def normalize_columns(columns):
     return normalized
 
 
-def run_etl():
-    print("Iniciando ETL completo con normalización numérica y textual...")
-
-    # 1 Detectar codificación
-    with open(DATA_PATH, "rb") as f:
-        raw = f.read()
-        detected = chardet.detect(raw)
-        encoding_used = detected["encoding"]
-    print(f" Codificación detectada: {encoding_used}")
-
-    # 2 Leer CSV
-    df = pd.read_csv(DATA_PATH, sep=",", encoding=encoding_used, on_bad_lines="skip")
-    print(f" Datos cargados: {df.shape[0]} filas, {df.shape[1]} columnas")
-
+def detectar_codificacion(path: str, max_bytes: int = SNIFF_BYTES) -> str:
+    """Detecta la codificación leyendo solo un prefijo acotado del archivo."""
+    detector = UniversalDetector()
+    leidos = 0
+    with open(path, "rb") as f:
+        for linea in f:
+            detector.feed(linea)
+            leidos += len(linea)
+            if detector.done or leidos >= max_bytes:
+                break
+    detector.close()
+    encoding = detector.result["encoding"] or "utf-8"
+    # Un prefijo ASCII no garantiza que el resto lo sea: UTF-8 es superconjunto
+    return "utf-8" if encoding.lower() == "ascii" else encoding
+
+
+def limpiar_dataframe(df: pd.DataFrame, text_cols=None, categorizar: bool = True) -> pd.DataFrame:
+    """
+    Aplica la limpieza del ETL a un DataFrame (completo o un bloque):
+    nombres de columnas, texto normalizado, edades válidas y vacíos reales.
+    Las columnas de texto de baja cardinalidad quedan como `category`.
+    """
     # 3 Normalizar nombres de columnas
     df.columns = normalize_columns(df.columns)
 
     # 4 Limpiar texto en columnas tipo string
-    for col in df.columns:
-        if df[col].dtype == "object":
-            df[col] = df[col].astype(str).apply(normalize_text)
+    if text_cols is None:
+        text_cols = [col for col in df.columns if df[col].dtype == "object"]
+    for col in text_cols:
+        df[col] = normalize_series(df[col], categorizar=categorizar)
 
     # 5 Procesar la columna edad
     if "edad" in df.columns:
@@ -67,15 +126,104 @@ def run_etl():
         # Eliminar edades fuera de rango (menores de 0 o >120)
         df.loc[(df["edad"] < 0) | (df["edad"] > 120), "edad"] = np.nan
 
-        # Convertir floats válidos a enteros y NaN a vacío
-        df["edad"] = df["edad"].apply(lambda x: "" if pd.isna(x) else int(x))
+        # Convertir floats válidos a enteros (NaN queda como vacío)
+        df["edad"] = np.trunc(df["edad"]).astype("Int64")
 
     # 6 Reemplazar espacios vacíos o 'nan' string por NaN visual
-    df = df.replace(r"^\s*$", "", regex=True)
+    # (las columnas de texto ya salen de normalize_series sin espacios sobrantes)
+    otras = [col for col in df.columns if col not in text_cols and df[col].dtype == "object"]
+    if otras:
+        df[otras] = df[otras].replace(r"^\s*$", "", regex=True)
+    return df
+
+
+def run_etl(chunksize: int = None, input_path: str = DATA_PATH, output_path: str = OUTPUT_PATH):
+    """
+    Ejecuta el ETL. Con `chunksize` procesa el archivo por bloques de ese
+    número de filas y los agrega a la salida, con memoria acotada.
+    """
+    if chunksize:
+        return run_etl_streaming(chunksize, input_path, output_path)
+
+    print("Iniciando ETL completo con normalización numérica y textual...")
+
+    # 1 Detectar codificación
+    with open(input_path, "rb") as f:
+        raw = f.read()
+        detected = chardet.detect(raw)
+        encoding_used = detected["encoding"]
+    print(f" Codificación detectada: {encoding_used}")
+
+    # 2 Leer CSV
+    df = pd.read_csv(input_path, sep=",", encoding=encoding_used, on_bad_lines="skip")
+    print(f" Datos cargados: {df.shape[0]} filas, {df.shape[1]} columnas")
+    anotar(filas=df.shape[0])
+
+    # 3-6 Limpieza
+    df = limpiar_dataframe(df)
+
+    # 7 Guardar archivo final limpio (Parquet + CSV opcional)
+    guardar_tabla(df, output_path)
+    print(f"Archivo final limpio guardado en: {output_path}")
+    print("Codificación: UTF-8 | Edades enteras | Vacíos reales \n")
+
+
+def tipos_por_bloques(path: str, encoding: str, chunksize: int) -> dict:
+    """
+    Tipo de cada columna en todo el archivo, recorriéndolo por bloques sin
+    guardarlos: el mismo en todos los bloques se conserva; si difieren y todos
+    son numéricos queda float64 y, si no, texto (object).
+    """
+    vistos = {}
+    for chunk in pd.read_csv(path, sep=",", encoding=encoding, on_bad_lines="skip", chunksize=chunksize):
+        for col, dtype in chunk.dtypes.items():
+            vistos.setdefault(col, set()).add(dtype)
+
+    def es_numero(dtype):
+        return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+    tipos = {}
+    for col, dtypes in vistos.items():
+        if len(dtypes) == 1:
+            tipos[col] = dtypes.pop()
+        elif all(es_numero(d) for d in dtypes):
+            tipos[col] = np.dtype("float64")
+        else:
+            tipos[col] = np.dtype(object)
+    return tipos
+
+
+def run_etl_streaming(chunksize: int = 100_000, input_path: str = DATA_PATH, output_path: str = OUTPUT_PATH):
+    """
+    ETL por bloques: detecta la codificación con un prefijo acotado, fija el
+    tipo de cada columna con una primera pasada (`tipos_por_bloques`), limpia
+    cada bloque de `chunksize` filas y lo agrega a la salida. El pico de
+    memoria depende del tamaño del bloque, no del archivo.
+    """
+    print(f"Iniciando ETL por bloques de {chunksize} filas...")
+
+    # 1 Detectar codificación (prefijo acotado)
+    encoding_used = detectar_codificacion(input_path)
+    print(f" Codificación detectada: {encoding_used}")
 
-    # 7 Guardar archivo final limpio
-    df.to_csv(OUTPUT_PATH, sep=";", encoding="utf-8", index=False)
-    print(f"Archivo final limpio guardado en: {OUTPUT_PATH}")
+    # 2 Tipos de columna de todo el archivo: se leen todos los bloques con ellos para
+    # que uno posterior (texto donde antes había números, o un vacío en una columna
+    # entera) no cambie el esquema que fijó el primero
+    tipos = tipos_por_bloques(input_path, encoding_used, chunksize)
+    text_cols = [normalize_columns([col])[0] for col, dtype in tipos.items() if dtype == object]
+
+    # 3-7 Leer, limpiar y agregar bloque a bloque
+    reader = pd.read_csv(input_path, sep=",", encoding=encoding_used, dtype=tipos,
+                         on_bad_lines="skip", chunksize=chunksize)
+    with EscritorTabla(output_path) as escritor:
+        for chunk in reader:
+            # Sin `category`: cada bloque tendría categorías distintas
+            escritor.escribir(limpiar_dataframe(chunk, text_cols, categorizar=False))
+    total = escritor.filas
+
+    print(f" Datos procesados: {total} filas")
+    anotar(filas=total)
+    print(f"Archivo final limpio guardado en: {output_path}")
     print("Codificación: UTF-8 | Edades enteras | Vacíos reales \n")
 
 
@@ -1,6 +1,8 @@
 import os
 import json
+import hashlib
 import numpy as np
+import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
@@ -10,6 +12,12 @@ from sklearn.metrics import (
     davies_bouldin_score,
     calinski_harabasz_score,
 )
+from joblib import Parallel, delayed
+from app.core.config import settings
+from app.infrastructure.instrumentation import medir
+
+K_SWEEP_CACHE = os.path.join("data", "cache", "k_sweep.json")
+K_SWEEP_CACHE_MAX = 10
 
 # ============================================================
 #  RESUMEN EN CONSOLA (temas top)
@@ -28,13 +36,102 @@ def mostrar_resumen(df, top_n=5):
     print("   (ver imágenes en data/visuals/ y reportes en data/reports/)")
 
 
+# ============================================================
+#  BARRIDO DE K (MUESTREADO, EN PARALELO Y CACHEADO)
+# ============================================================
+def muestra_estratificada(etiquetas, n: int, semilla: int = 42) -> np.ndarray:
+    """Índices de una muestra de ~`n` filas que conserva la proporción de cada etiqueta."""
+    etiquetas = np.asarray(etiquetas)
+    if n <= 0 or n >= len(etiquetas):
+        return np.arange(len(etiquetas))
+    indices = pd.Series(np.arange(len(etiquetas)))
+    return np.sort(indices.groupby(etiquetas).sample(frac=n / len(etiquetas), random_state=semilla).to_numpy())
+
+
+def huella_embeddings(embeddings) -> str:
+    emb = np.ascontiguousarray(embeddings)
+    h = hashlib.sha256(f"{emb.shape}{emb.dtype}".encode())
+    h.update(memoryview(emb).cast("B"))
+    return h.hexdigest()
+
+
+def _evaluar_k(embeddings, k, ajuste, silueta):
+    """
+    Ajusta KMeans sobre la muestra de ajuste; inercia sobre todo el corpus y
+    Silhouette sobre la muestra. Para las curvas bastan 3 inicializaciones.
+    """
+    km = KMeans(n_clusters=k, random_state=42, n_init=3).fit(embeddings[ajuste])
+    inercia = -km.score(embeddings)
+    etiquetas = km.predict(embeddings[silueta])
+    sil = silhouette_score(embeddings[silueta], etiquetas) if len(set(etiquetas)) > 1 else np.nan
+    return k, float(inercia), float(sil)
+
+
+def _leer_cache_k() -> dict:
+    if os.path.exists(K_SWEEP_CACHE):
+        with open(K_SWEEP_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _guardar_cache_k(cache: dict):
+    os.makedirs(os.path.dirname(K_SWEEP_CACHE), exist_ok=True)
+    # Se conservan solo las entradas más recientes
+    cache = dict(list(cache.items())[-K_SWEEP_CACHE_MAX:])
+    with open(K_SWEEP_CACHE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(K_SWEEP_CACHE + ".tmp", K_SWEEP_CACHE)
+
+
+def barrido_k(embeddings, etiquetas, ks, modelo=None, muestra_silueta: int = None, muestra_ajuste: int = None):
+    """
+    Inercia y Silhouette por K. Cada K se ajusta en paralelo sobre una muestra
+    estratificada (por tema) y la Silhouette se calcula sobre otra muestra
+    más chica; la inercia se mide sobre todo el corpus. Para el K del modelo
+    principal (`modelo`) se reutiliza su ajuste. Los resultados de los demás
+    K se cachean por huella de los embeddings.
+    """
+    muestra_silueta = muestra_silueta or settings.K_SWEEP_SAMPLE
+    muestra_ajuste = muestra_ajuste or settings.K_SWEEP_FIT_SAMPLE
+    silueta = muestra_estratificada(etiquetas, muestra_silueta)
+    ajuste = muestra_estratificada(etiquetas, muestra_ajuste)
+
+    k_modelo = int(modelo.n_clusters) if modelo is not None else None
+    clave = f"{huella_embeddings(embeddings)}:{muestra_silueta}:{muestra_ajuste}"
+    cache = _leer_cache_k()
+    previos = cache.get(clave, {})
+    pendientes = [k for k in ks if k != k_modelo and str(k) not in previos]
+    en_cache = [k for k in ks if k != k_modelo and str(k) in previos]
+    if en_cache:
+        print(f" Barrido de K: {len(en_cache)} valores tomados de la caché")
+
+    calculados = Parallel(n_jobs=settings.K_SWEEP_JOBS)(
+        delayed(_evaluar_k)(embeddings, k, ajuste, silueta) for k in pendientes
+    )
+    for k, inercia, sil in calculados:
+        previos[str(k)] = [inercia, sil]
+    if calculados:
+        cache.pop(clave, None)
+        cache[clave] = previos
+        _guardar_cache_k(cache)
+
+    resultados = {int(k): tuple(v) for k, v in previos.items()}
+    if k_modelo in ks:
+        sil = silhouette_score(embeddings[silueta], etiquetas[silueta]) if len(set(etiquetas[silueta])) > 1 else np.nan
+        resultados[k_modelo] = (float(-modelo.score(embeddings)), float(sil))
+    inertias = [resultados[k][0] for k in ks]
+    silhouettes = [resultados[k][1] for k in ks]
+    return inertias, silhouettes
+
+
 # ============================================================
 #  EVALUACIÓN + GRÁFICOS (CLUSTERING + SENTIMIENTO)
 # ============================================================
-def evaluar_y_graficar(df, embeddings, k_min=3, k_max=10):
+def evaluar_y_graficar(df, embeddings, k_min=3, k_max=10, modelo=None, muestra_metricas: int = None):
     """
-    - Calcula métricas del clustering (Silhouette, Davies-Bouldin, Calinski-Harabasz)
-    - Genera curvas de selección de K (elbow e índice Silhouette por K)
+    - Calcula métricas del clustering (Silhouette sobre una muestra estratificada, Davies-Bouldin, Calinski-Harabasz);
+      con `muestra_metricas`, todas sobre una muestra estratificada de ese tamaño
+    - Genera curvas de selección de K (elbow e índice Silhouette por K), reutilizando `modelo` para su K
     - Crea gráficos por tema y sentimientos
     - Guarda métricas y tablas en data/reports (con separador ';')
     """
@@ -47,10 +144,14 @@ def evaluar_y_graficar(df, embeddings, k_min=3, k_max=10):
     # ============================================================
     #  MÉTRICAS DE CLUSTERING
     # ============================================================
+    etiquetas = df["tema"].to_numpy()
+    filas = muestra_estratificada(etiquetas, muestra_metricas) if muestra_metricas else slice(None)
+    embeddings, etiquetas = np.asarray(embeddings[filas]), etiquetas[filas]
     try:
-        sil = silhouette_score(embeddings, df["tema"])
-        db = davies_bouldin_score(embeddings, df["tema"])
-        ch = calinski_harabasz_score(embeddings, df["tema"])
+        muestra = muestra_estratificada(etiquetas, settings.K_SWEEP_SAMPLE)
+        sil = silhouette_score(embeddings[muestra], etiquetas[muestra])
+        db = davies_bouldin_score(embeddings, etiquetas)
+        ch = calinski_harabasz_score(embeddings, etiquetas)
         print(f"Silhouette: {sil:.3f} | 🔻 Davies-Bouldin: {db:.3f} | 🔺 Calinski-Harabasz: {ch:.0f}")
     except Exception as e:
         sil = db = ch = None
@@ -65,12 +166,8 @@ def evaluar_y_graficar(df, embeddings, k_min=3, k_max=10):
     # ============================================================
     try:
         ks = list(range(k_min, k_max + 1))
-        inertias, silhouettes = [], []
-        for k in ks:
-            km = KMeans(n_clusters=k, random_state=42, n_init=10)
-            labels = km.fit_predict(embeddings)
-            inertias.append(km.inertia_)
-            silhouettes.append(silhouette_score(embeddings, labels) if len(set(labels)) > 1 else np.nan)
+        with medir("barrido_k", filas=len(embeddings), ks=len(ks)):
+            inertias, silhouettes = barrido_k(embeddings, etiquetas, ks, modelo=modelo)
 
         # Elbow (Inertia)
         plt.figure(figsize=(8, 5))
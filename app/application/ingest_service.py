@@ -0,0 +1,168 @@
+import hashlib
+import os
+import pandas as pd
+from app.application.data_service import (
+    DATA_PATH, detectar_codificacion, limpiar_dataframe, normalize_columns
+)
+from app.application.nlp_service import (
+    preparar_datos, generar_embeddings, actualizar_modelo_temas, asignar_temas, analizar_sentimientos,
+    guardar_resumen_confianza
+)
+from app.application.social_module import (
+    BASE_COLS,
+    agregados_desde_estadisticos, estadisticos_por_ciudad, indice_desde_agregados, sumar_estadisticos
+)
+from app.application.visual_service import actualizar_datos_graficos
+from app.infrastructure.manifest import cargar_manifiesto, guardar_manifiesto
+from app.infrastructure.storage import (
+    CSV_NA_VALUES, agregar_tabla, columnas_texto, existe_tabla, guardar_tabla, leer_tabla
+)
+
+# ==============================
+# RUTAS
+# ==============================
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CLEAN_DATA = os.path.join(DATA_DIR, "clean_data")
+THEMES_NLP = os.path.join(DATA_DIR, "themes_nlp")
+SOCIAL_STATS = os.path.join(DATA_DIR, "social_stats")
+IMPACT_SOCIAL = os.path.join(DATA_DIR, "impact_social")
+FINAL_RESULTS = os.path.join(DATA_DIR, "final_results")
+
+
+# ==============================
+# 1 DETECTAR REPORTES NUEVOS
+# ==============================
+def _leer_original(path: str = DATA_PATH) -> tuple:
+    """
+    Lee de original.csv solo lo agregado desde la última ingesta: el byte hasta
+    el que se leyó queda en el manifiesto, junto con la cabecera. Si el archivo
+    se reescribió (otra cabecera o más corto) se lee completo.
+    Devuelve (filas, posición final leída).
+    """
+    encoding = detectar_codificacion(path)
+    columnas = pd.read_csv(path, sep=",", encoding=encoding, nrows=0).columns
+    previo = cargar_manifiesto().get("ingesta", {}).get("original")
+    with open(path, "rb") as f:
+        cabecera = f.readline()
+        fin = os.fstat(f.fileno()).st_size
+        huella = hashlib.sha256(cabecera).hexdigest()
+        if previo and previo["cabecera"] == huella and len(cabecera) <= previo["posicion"] <= fin:
+            f.seek(previo["posicion"])
+        if f.tell() == fin:
+            return pd.DataFrame(columns=columnas), fin
+        filas = pd.read_csv(f, sep=",", encoding=encoding, on_bad_lines="skip", header=None, names=columnas)
+    return filas, fin
+
+
+def _registrar_lectura_original(posicion: int, path: str = DATA_PATH):
+    """Guarda hasta qué byte de original.csv ya se ingirió."""
+    with open(path, "rb") as f:
+        huella = hashlib.sha256(f.readline()).hexdigest()
+    manifiesto = cargar_manifiesto()
+    manifiesto.setdefault("ingesta", {})["original"] = {"cabecera": huella, "posicion": posicion}
+    guardar_manifiesto(manifiesto)
+
+
+def _solo_nuevos(crudo: pd.DataFrame) -> pd.DataFrame:
+    """Filtra las filas cuyo `id` aún no está en clean_data (solo se leen los IDs del bloque)."""
+    columnas = normalize_columns(crudo.columns)
+    col_id = crudo.columns[columnas.index("id")]
+    ids = crudo[col_id].dropna().unique().tolist()
+    existentes = leer_tabla(CLEAN_DATA, columns=["id"], filtros={"id": ids})["id"] if ids else []
+    return crudo[~crudo[col_id].isin(existentes)].reset_index(drop=True)
+
+
+# ==============================
+# 2 INGESTA INCREMENTAL
+# ==============================
+def ingestar_reportes(nuevos: pd.DataFrame = None) -> dict:
+    """
+    Procesa solo los reportes nuevos (por `id`) sin recalcular todo el corpus:
+    - Si `nuevos` es None, toma de original.csv los IDs que aún no están en clean_data.
+    - Si se entrega un DataFrame (mismas columnas que original.csv), sus filas
+      nuevas se agregan también a original.csv para que una corrida completa las incluya.
+    Las filas se limpian, se generan sus embeddings, se asignan a los temas ya
+    entrenados y se puntúa su sentimiento. Sus sumas por ciudad se añaden a la
+    tabla de estadísticos sociales y sus conteos a los de los gráficos, y sus
+    filas integradas se agregan a final_results.
+    """
+    print("Iniciando ingesta incremental de reportes...")
+    if nuevos is None:
+        crudo, posicion = _leer_original()
+    else:
+        crudo, posicion = nuevos, None
+    delta = _solo_nuevos(crudo)
+    if delta.empty:
+        print("No hay reportes nuevos para procesar.")
+        if posicion is not None:
+            _registrar_lectura_original(posicion)
+        return {"nuevos": 0, "ciudades_afectadas": []}
+    print(f" Reportes nuevos: {len(delta)}")
+
+    # Todo el bloque se procesa en memoria y las tablas se escriben al final: si un
+    # modelo falla no queda nada a medias y un reintento vuelve a encontrar los reportes
+    # -------------------------------------------------
+    # 1 ETL del bloque nuevo
+    # -------------------------------------------------
+    # Las columnas de texto se toman del esquema de clean_data para que el bloque no cambie de tipo
+    columnas = normalize_columns(delta.columns)
+    text_cols = [c for c in columnas_texto(CLEAN_DATA) if c in columnas] or None
+    limpio = limpiar_dataframe(delta.set_axis(columnas, axis=1), text_cols, categorizar=False)
+
+    # -------------------------------------------------
+    # 2 NLP del bloque: embeddings, sentimiento y tema
+    # (el modelo de temas se actualiza cuando ya se puntuó el sentimiento)
+    # -------------------------------------------------
+    nlp_df = preparar_datos(limpio.copy(), desde_etl=True)
+    embeddings = generar_embeddings(nlp_df)
+    nlp_df = analizar_sentimientos(nlp_df, sanity_check=False)
+    actualizar_modelo_temas(embeddings)
+    nlp_df = asignar_temas(nlp_df, embeddings)
+
+    # -------------------------------------------------
+    # 3 Estadísticos sociales: se suman los del bloque nuevo
+    # -------------------------------------------------
+    bloque = limpio[["id", "ciudad", "nivel_de_urgencia"] + BASE_COLS].copy()
+    # Igual que al leer la tabla guardada: los textos vacíos cuentan como nulos
+    bloque["ciudad"] = bloque["ciudad"].where(~bloque["ciudad"].isin(CSV_NA_VALUES))
+    ciudades = sorted(bloque["ciudad"].dropna().astype(str).unique())
+    if existe_tabla(SOCIAL_STATS):
+        previos = leer_tabla(SOCIAL_STATS)
+    else:
+        # Primera ingesta sin estadísticos guardados: se calculan una vez para el corpus ya limpio
+        previos = estadisticos_por_ciudad(leer_tabla(CLEAN_DATA))
+    estadisticos = sumar_estadisticos(previos, estadisticos_por_ciudad(bloque))
+    social_df = indice_desde_agregados(agregados_desde_estadisticos(estadisticos))
+
+    # -------------------------------------------------
+    # 4 Escritura: bloques de clean_data, themes_nlp y de la tabla integrada
+    # (con el índice actualizado; las filas anteriores conservan el suyo hasta
+    # la próxima corrida completa), estadísticos e índice por ciudad
+    # -------------------------------------------------
+    agregar_tabla(limpio, CLEAN_DATA)
+    agregar_tabla(nlp_df, THEMES_NLP)
+    # Los percentiles no se pueden sumar por bloques: el resumen de confianza se
+    # recalcula leyendo solo ciudad, tema y margen de la tabla
+    guardar_resumen_confianza()
+    guardar_tabla(estadisticos, SOCIAL_STATS)
+    guardar_tabla(social_df, IMPACT_SOCIAL)
+    agregar_tabla(pd.merge(social_df, nlp_df, on="ciudad", how="inner"), FINAL_RESULTS)
+
+    # Series de los gráficos que la API sirve al dashboard (estadísticos del bloque + índice)
+    actualizar_datos_graficos({"clean_data": limpio, "themes_nlp": nlp_df}, social_df)
+
+    if nuevos is not None:
+        # Quedan después de la posición ya leída: una ingesta desde el archivo las
+        # relee pero las descarta por `id`
+        original_cols = pd.read_csv(DATA_PATH, nrows=0).columns
+        delta[original_cols].to_csv(DATA_PATH, mode="a", header=False, index=False, encoding="utf-8")
+    else:
+        _registrar_lectura_original(posicion)
+
+    print(f"✅ Ingesta completada: {len(delta)} reportes, ciudades afectadas: {', '.join(ciudades)}")
+    return {"nuevos": int(len(delta)), "ciudades_afectadas": ciudades}
+
+
+if __name__ == "__main__":
+    ingestar_reportes()
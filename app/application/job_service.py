@@ -0,0 +1,123 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.application.pipeline import ETAPAS, run_pipeline
+
+# ==============================
+#  EJECUCIÓN EN SEGUNDO PLANO
+# ==============================
+# Las corridas del pipeline se encolan y se ejecutan de a una en un hilo del
+# mismo proceso (así reutilizan los modelos ya cargados en el registro). Las
+# peticiones que llegan mientras hay una corrida activa se unen a ella.
+MAX_TRABAJOS = 50
+
+_ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline")
+_trabajos = {}
+_lock = threading.Lock()
+# Lo toman el pipeline y la ingesta: ambos reescriben las mismas tablas
+bloqueo_datos = threading.Lock()
+
+
+def _ahora() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _activo():
+    """Trabajo en cola o en ejecución; como las peticiones se unen, hay uno como mucho."""
+    return next((t for t in _trabajos.values() if t["estado"] in ("en_cola", "ejecutando")), None)
+
+
+def _copia(trabajo: dict) -> dict:
+    return {**trabajo, "etapas": {nombre: dict(e) for nombre, e in trabajo["etapas"].items()}}
+
+
+def _registrar_progreso(trabajo: dict):
+    def progreso(etapa: str, estado: str, segundos: float):
+        with _lock:
+            trabajo["etapas"][etapa] = {"estado": estado, "segundos": round(segundos, 3)}
+            trabajo["etapa_actual"] = etapa if estado == "ejecutando" else None
+            terminadas = sum(e["estado"] != "ejecutando" for e in trabajo["etapas"].values())
+            trabajo["progreso"] = round(terminadas / len(ETAPAS), 2)
+    return progreso
+
+
+def _ejecutar(trabajo: dict):
+    with _lock:
+        trabajo.update(estado="ejecutando", iniciado_en=_ahora())
+    inicio = time.perf_counter()
+    try:
+        with bloqueo_datos:
+            run_pipeline(force=trabajo["force"], progreso=_registrar_progreso(trabajo))
+        estado, error = "completado", None
+    except Exception as e:
+        traceback.print_exc()
+        estado, error = "error", str(e)
+    with _lock:
+        trabajo.update(
+            estado=estado,
+            error=error,
+            terminado_en=_ahora(),
+            segundos=round(time.perf_counter() - inicio, 3),
+            etapa_actual=None,
+        )
+        if estado == "completado":
+            trabajo["resultado"] = {"data_folder": "data/", "dashboard_images": "app/infrastructure/visuals/"}
+
+
+def _podar():
+    """Conserva solo los MAX_TRABAJOS más recientes entre los terminados."""
+    terminados = [i for i, t in _trabajos.items() if t["estado"] in ("completado", "error")]
+    for trabajo_id in terminados[:max(0, len(_trabajos) - MAX_TRABAJOS)]:
+        del _trabajos[trabajo_id]
+
+
+def encolar_pipeline(force: bool = False) -> tuple:
+    """
+    Encola una corrida de `run_pipeline` y devuelve (trabajo, unido). Si ya hay
+    una corrida en cola o en ejecución no se lanza otra: se devuelve esa
+    (`unido=True`). Un `force` pedido mientras la corrida sigue en cola se le suma.
+    """
+    with _lock:
+        activo = _activo()
+        if activo is not None:
+            activo["solicitudes"] += 1
+            if activo["estado"] == "en_cola":
+                activo["force"] = activo["force"] or force
+            return _copia(activo), True
+
+        trabajo = {
+            "id": uuid.uuid4().hex[:12],
+            "tipo": "pipeline",
+            "estado": "en_cola",
+            "force": force,
+            "solicitudes": 1,
+            "creado_en": _ahora(),
+            "iniciado_en": None,
+            "terminado_en": None,
+            "segundos": None,
+            "etapa_actual": None,
+            "progreso": 0.0,
+            "etapas": {},
+            "resultado": None,
+            "error": None,
+        }
+        _trabajos[trabajo["id"]] = trabajo
+        _podar()
+        _ejecutor.submit(_ejecutar, trabajo)
+        return _copia(trabajo), False
+
+
+def estado_trabajo(trabajo_id: str) -> dict:
+    """Copia del estado de un trabajo, o None si no existe."""
+    with _lock:
+        trabajo = _trabajos.get(trabajo_id)
+        return None if trabajo is None else _copia(trabajo)
+
+
+def listar_trabajos() -> list:
+    """Trabajos conocidos, del más reciente al más antiguo."""
+    with _lock:
+        return [_copia(t) for t in reversed(list(_trabajos.values()))]
@@ -1,41 +1,239 @@
+import json
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import re
 import string
+import joblib
 import nltk
 import torch
 import numpy as np
 from nltk.corpus import stopwords
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from app.core.config import settings
 from app.application.helpers import evaluar_y_graficar, mostrar_resumen
+from app.application.data_service import categorizar_columnas
+from app.infrastructure.storage import esquema_tabla, guardar_tabla, leer_tabla
+from app.infrastructure.vector_cache import CacheVectores, VectoresPorFila, hash_textos
+from app.infrastructure.model_registry import obtener_modelo
+from app.infrastructure.instrumentation import anotar, medir
+from app.infrastructure.inference_backends import cargar_clasificador, cargar_codificador, validar_backend
+
+# Modelos y parámetros del análisis (forman parte de la huella del pipeline)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+SENTIMENT_MODEL = "pysentimiento/robertuito-sentiment-analysis"
+N_CLUSTERS = 6
+SENTIMENT_MAX_LENGTH = 256
+
+# Modelo de temas persistido (centroides + palabras clave) para asignar reportes nuevos
+TOPIC_MODEL_PATH = os.path.join("data", "models", "temas_kmeans.joblib")
+# Concordancia de etiquetas de cada backend con PyTorch (se mide una vez por modelo y backend)
+PARITY_CACHE = os.path.join("data", "cache", "paridad_backend.json")
+THEMES_NLP = os.path.join("data", "themes_nlp")
+CONFIDENCE_SUMMARY = os.path.join("data", "themes_nlp_confianza.json")
+
+# ============================================================
+#  MODELOS (se cargan una vez por proceso, al primer uso)
+# ============================================================
+def cargar_stopwords() -> set:
+    def cargar():
+        try:
+            return set(stopwords.words("spanish"))
+        except LookupError:
+            nltk.download("stopwords", quiet=True)
+            return set(stopwords.words("spanish"))
+    return obtener_modelo("stopwords:spanish", cargar)
+
+
+def backend_actual() -> str:
+    return validar_backend(settings.NLP_BACKEND)
+
+
+def clave_cache(modelo: str, backend: str = None) -> str:
+    """Las salidas de cada backend se cachean por separado (int8/ONNX no son idénticos a torch)."""
+    backend = backend or backend_actual()
+    return modelo if backend == "torch" else f"{modelo}@{backend}"
+
+
+def modelo_embeddings(backend: str = None):
+    backend = backend or backend_actual()
+    return obtener_modelo(f"embeddings:{EMBEDDING_MODEL}:{backend}",
+                          lambda: cargar_codificador(EMBEDDING_MODEL, backend))
+
+
+def modelo_sentimiento(backend: str = None):
+    """Devuelve (tokenizer, modelo) del clasificador de sentimiento."""
+    backend = backend or backend_actual()
+    return obtener_modelo(f"sentimiento:{SENTIMENT_MODEL}:{backend}",
+                          lambda: cargar_clasificador(SENTIMENT_MODEL, backend))
+
+
+def _leer_paridad() -> dict:
+    if os.path.exists(PARITY_CACHE):
+        with open(PARITY_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _guardar_paridad(cache: dict):
+    os.makedirs(os.path.dirname(PARITY_CACHE), exist_ok=True)
+    with open(PARITY_CACHE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(PARITY_CACHE + ".tmp", PARITY_CACHE)
+
+
+def verificar_paridad_backend(textos: list, backend: str = None, umbral: float = None, muestra: int = 2000) -> float:
+    """
+    Compara las etiquetas de sentimiento del backend con las de PyTorch sobre
+    (hasta `muestra`) `textos` y lanza ValueError si la concordancia queda bajo `umbral`.
+    La comparación se hace una vez por modelo y backend: su resultado queda en
+    PARITY_CACHE y las corridas siguientes solo lo contrastan con el umbral.
+    """
+    backend = backend or backend_actual()
+    textos = textos[:muestra]
+    umbral = settings.NLP_PARITY_MIN if umbral is None else umbral
+    if backend == "torch" or not textos:
+        return 1.0
+
+    cache = _leer_paridad()
+    clave = clave_cache(SENTIMENT_MODEL, backend)
+    if clave in cache:
+        concordancia = cache[clave]["concordancia"]
+    else:
+        # La referencia fp32 se pide al registro: si ya está cargada no se vuelve a leer
+        referencia = inferir_sentimiento(textos, *modelo_sentimiento("torch"))
+        obtenidas = inferir_sentimiento(textos, *modelo_sentimiento(backend))
+        concordancia = float((referencia.argmax(axis=1) == obtenidas.argmax(axis=1)).mean())
+        cache[clave] = {"concordancia": concordancia, "textos": len(textos),
+                        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        _guardar_paridad(cache)
+    print(f" Paridad de etiquetas {backend} vs torch: {concordancia:.2%} (mínimo {umbral:.2%})")
+    if concordancia < umbral:
+        raise ValueError(
+            f"El backend '{backend}' coincide con PyTorch en {concordancia:.2%} de las etiquetas "
+            f"(mínimo {umbral:.2%}). Usa NLP_BACKEND=torch o ajusta NLP_PARITY_MIN."
+        )
+    return concordancia
+
+
+# ============================================================
+#  EJECUCIÓN POR FRAGMENTOS EN VARIOS PROCESOS
+# ============================================================
+def _iniciar_worker(hilos: int):
+    torch.set_num_threads(hilos)
+
+
+def _fragmento_embeddings(textos: list) -> np.ndarray:
+    return np.asarray(modelo_embeddings().encode(textos, show_progress_bar=False), dtype=np.float32)
+
+
+def _fragmento_sentimiento(textos: list) -> np.ndarray:
+    return inferir_sentimiento(textos, *modelo_sentimiento())
+
+
+def _ejecutar_fragmento(funcion, indice: int, textos: list):
+    inicio = time.perf_counter()
+    resultado = funcion(textos)
+    return indice, resultado, time.perf_counter() - inicio, os.getpid()
+
+
+def _inferencia_en_proceso(n_textos: int, workers: int = None) -> bool:
+    """True si `inferir_en_paralelo` con `n_textos` correrá en el proceso actual."""
+    workers = workers or settings.NLP_WORKERS
+    return workers <= 1 or n_textos < 2 * workers
+
+
+def inferir_en_paralelo(funcion, textos: list, workers: int = None) -> np.ndarray:
+    """
+    Divide `textos` en un fragmento contiguo por proceso, aplica `funcion` en
+    cada uno y concatena los resultados en el orden original. Cada proceso
+    carga su modelo una vez desde el registro. Con `workers` <= 1 (o pocos
+    textos) corre en el proceso actual.
+    """
+    workers = workers or settings.NLP_WORKERS
+    if _inferencia_en_proceso(len(textos), workers):
+        return funcion(textos)
+
+    fragmentos = np.array_split(np.arange(len(textos)), workers)
+    hilos = max(1, (os.cpu_count() or 1) // workers)
+    # Sin fork: el pool puede crearse desde un hilo de la API (corrida en segundo
+    # plano) y los hijos heredarían locks tomados, pools de hilos y sesiones abiertas.
+    # forkserver parte de un proceso limpio que ya importó este módulo.
+    if "forkserver" in mp.get_all_start_methods():
+        contexto = mp.get_context("forkserver")
+        contexto.set_forkserver_preload([__name__])
+    else:
+        contexto = mp.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=contexto,
+                             initializer=_iniciar_worker, initargs=(hilos,)) as pool:
+        futuros = [pool.submit(_ejecutar_fragmento, funcion, i, [textos[j] for j in idx])
+                   for i, idx in enumerate(fragmentos)]
+        resultados = sorted((f.result() for f in futuros), key=lambda r: r[0])
+
+    print(f" Ejecución en {workers} procesos ({hilos} hilos c/u):")
+    for indice, resultado, segundos, pid in resultados:
+        print(f"   worker {indice} (pid {pid}): {len(resultado)} textos en {segundos:.1f}s "
+              f"-> {len(resultado) / segundos if segundos else 0:.0f} textos/s")
+    return np.concatenate([r[1] for r in resultados])
 
-nltk.download("stopwords")
 
 # ============================================================
 #  1 CARGAR Y PREPARAR DATOS LIMPIOS
 # ============================================================
 def cargar_y_preparar_datos(path: str) -> pd.DataFrame:
     print("Cargando dataset limpio...")
-    df = pd.read_csv(path, sep=";", encoding="utf-8")
+    df = leer_tabla(path)
     df.columns = [c.strip().lower() for c in df.columns]
+    df = categorizar_columnas(df)
+    # clean_data ya pasó por el ETL (minúsculas, sin acentos ni puntuación)
+    return preparar_datos(df, desde_etl=True)
+
+
+TABLA_PUNTUACION = str.maketrans("", "", string.punctuation)
+
+
+def limpiar_texto(texto, stop_words: set) -> str:
+    """Limpieza de un comentario: minúsculas, sin dígitos, puntuación ni stopwords."""
+    if pd.isna(texto):
+        return ""
+    texto = texto.lower()
+    texto = re.sub(r"\d+", "", texto)
+    texto = texto.translate(TABLA_PUNTUACION)
+    palabras = [p for p in texto.split() if p not in stop_words]
+    return " ".join(palabras)
 
-    if "comentario" not in df.columns:
-        raise ValueError(f"No se encontró la columna 'comentario'. Columnas: {df.columns.tolist()}")
 
-    stop_words = set(stopwords.words("spanish"))
+def limpiar_comentarios(serie: pd.Series, stop_words: set, desde_etl: bool = False) -> pd.Series:
+    """
+    Versión vectorizada de `limpiar_texto` para una columna: limpia solo los
+    textos distintos (operaciones `.str` + filtro de stopwords por tokens) y
+    los reparte a las filas; el resultado es idéntico a aplicarla fila a fila.
+    Con `desde_etl=True` se omiten minúsculas y puntuación, que el ETL ya dejó
+    en [a-z0-9 ].
+    """
+    codigos, unicos = pd.factorize(serie.astype(object), sort=False)
+    textos = pd.Series(unicos, dtype=object)
+    if not desde_etl:
+        textos = textos.str.lower()
+    textos = textos.str.replace(r"\d+", "", regex=True)
+    if not desde_etl:
+        textos = textos.str.translate(TABLA_PUNTUACION)
+    limpios = [" ".join([p for p in t.split() if p not in stop_words]) for t in textos]
+    # Los nulos (código -1) toman el último elemento: texto vacío
+    limpios = np.array(limpios + [""], dtype=object)
+    return pd.Series(limpios[codigos], index=serie.index, dtype=object)
 
-    def limpiar_texto(texto):
-        if pd.isna(texto):
-            return ""
-        texto = texto.lower()
-        texto = re.sub(r"\d+", "", texto)
-        texto = texto.translate(str.maketrans("", "", string.punctuation))
-        palabras = [p for p in texto.split() if p not in stop_words]
-        return " ".join(palabras)
 
-    df["comentario_limpio"] = df["comentario"].apply(limpiar_texto)
+def preparar_datos(df: pd.DataFrame, desde_etl: bool = False) -> pd.DataFrame:
+    """Agrega `comentario_limpio` (sin dígitos, puntuación ni stopwords)."""
+    if "comentario" not in df.columns:
+        raise ValueError(f"No se encontró la columna 'comentario'. Columnas: {df.columns.tolist()}")
+
+    df["comentario_limpio"] = limpiar_comentarios(df["comentario"], cargar_stopwords(), desde_etl)
     print(f"✅ Limpieza completada. Total de filas: {len(df)}")
     return df
 
@@ -43,10 +241,55 @@ def cargar_y_preparar_datos(path: str) -> pd.DataFrame:
 # ============================================================
 #  2️ GENERAR EMBEDDINGS SEMÁNTICOS
 # ============================================================
-def generar_embeddings(df: pd.DataFrame):
+def generar_embeddings(df: pd.DataFrame, usar_cache: bool = True):
+    """
+    Codifica `comentario_limpio` una sola vez por texto distinto. Los vectores
+    se guardan en una caché en disco (por hash del texto y nombre del modelo),
+    así que en corridas siguientes solo se codifican los textos nuevos.
+    Devuelve los embeddings por fila como `VectoresPorFila` sobre la caché.
+    """
     print("Generando embeddings semánticos (modelo MiniLM)...")
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model.encode(df["comentario_limpio"].tolist(), show_progress_bar=True)
+    codigos, unicos = pd.factorize(df["comentario_limpio"].fillna("").astype(str), sort=False)
+    unicos = unicos.tolist()
+    hashes = hash_textos(unicos)
+
+    cache = CacheVectores(clave_cache(EMBEDDING_MODEL), "embeddings") if usar_cache else None
+    if cache is not None:
+        encontrados = cache.posiciones(hashes) >= 0
+    else:
+        encontrados = np.zeros(len(unicos), dtype=bool)
+    faltantes = np.flatnonzero(~encontrados)
+
+    segundos = 0.0
+    nuevos = None
+    if len(faltantes):
+        # En el proceso actual el modelo se carga fuera de la medición de la inferencia;
+        # con varios procesos no se carga aquí: cada worker (forkserver) carga el suyo
+        if _inferencia_en_proceso(len(faltantes)):
+            modelo_embeddings()
+        inicio = time.perf_counter()
+        with medir("inferencia", filas=len(faltantes)):
+            nuevos = inferir_en_paralelo(_fragmento_embeddings, [unicos[i] for i in faltantes])
+        segundos = time.perf_counter() - inicio
+        if cache is not None:
+            cache.agregar(hashes[faltantes], nuevos, segundos)
+
+    # Las filas se leen del memmap de la caché (un vector por texto distinto) a
+    # medida que se piden: no se arma la matriz de todas las filas
+    if cache is not None:
+        embeddings = VectoresPorFila(cache.matriz(), cache.posiciones(hashes)[codigos])
+    else:
+        embeddings = VectoresPorFila(nuevos if nuevos is not None else np.empty((0, 0), dtype=np.float32), codigos)
+
+    # Resumen: filas servidas sin pasar por el modelo y tiempo estimado ahorrado
+    por_texto = (cache.meta["segundos_por_texto"] if cache is not None else None) or (
+        segundos / len(faltantes) if len(faltantes) else 0.0
+    )
+    evitados = len(df) - len(faltantes)
+    print(f" Textos distintos: {len(unicos)} de {len(df)} filas; codificados: {len(faltantes)}")
+    if cache is not None:
+        print(f" Aciertos en caché: {int(encontrados.sum())}/{len(unicos)} ({encontrados.mean() if len(unicos) else 0:.1%})")
+    print(f" Tiempo de codificación: {segundos:.1f}s; ahorrado (estimado): {evitados * por_texto:.1f}s")
     print("✅ Embeddings generados correctamente.")
     return embeddings
 
@@ -54,64 +297,339 @@ def generar_embeddings(df: pd.DataFrame):
 # ============================================================
 #  3 AGRUPAR TEMAS Y EXTRAER PALABRAS CLAVE
 # ============================================================
-def agrupar_y_extraer_temas(df: pd.DataFrame, embeddings, n_clusters: int = 6) -> pd.DataFrame:
+def agrupar_y_extraer_temas(df: pd.DataFrame, embeddings, n_clusters: int = N_CLUSTERS) -> pd.DataFrame:
     print(f"Agrupando en {n_clusters} temas...")
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    df["tema"] = kmeans.fit_predict(embeddings)
+    with medir(f"kmeans[{settings.TOPIC_CLUSTERING}]", filas=len(df)):
+        if settings.TOPIC_CLUSTERING == "minibatch":
+            kmeans = ajustar_kmeans_por_bloques(embeddings, n_clusters)
+            df["tema"] = predecir_por_bloques(kmeans, embeddings)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+            df["tema"] = kmeans.fit_predict(np.asarray(embeddings))
 
     print("Extrayendo palabras clave por tema...")
-    temas = sorted(df["tema"].unique())
-    resultados = []
-
-    for tema in temas:
-        textos = df[df["tema"] == tema]["comentario_limpio"].dropna().tolist()
-        textos_filtrados = [t for t in textos if len(t.split()) > 1]
-        if len(textos_filtrados) < 2:
-            resultados.append({"tema": tema, "palabras_clave": "(sin datos suficientes)"})
+    with medir("palabras_clave", filas=len(df)):
+        palabras = palabras_clave_por_tema(df["comentario_limpio"], df["tema"].to_numpy())
+    resultados = [{"tema": tema, "palabras_clave": palabras[tema]} for tema in sorted(palabras)]
+    df["palabras_clave"] = df["tema"].map(palabras)
+    guardar_modelo_temas(kmeans, resultados)
+    print("✅ Temas y palabras clave generadas correctamente.")
+    return df
+
+
+def palabras_clave_por_tema(textos: pd.Series, temas: np.ndarray, n_palabras: int = 5) -> dict:
+    """
+    Palabras clave de cada tema con una sola vectorización del corpus: los
+    textos distintos se cuentan una vez, se suman por tema con un producto
+    disperso y se toman los `n_palabras` términos más frecuentes del tema
+    (mismo criterio y desempate que `max_features` de un vectorizador por tema).
+    Temas con menos de 2 textos de más de una palabra: "(sin datos suficientes)".
+    """
+    temas = np.asarray(temas)
+    codigos, unicos = pd.factorize(textos, sort=False)
+    unicos = unicos.astype(str)
+    # Solo cuentan los textos de más de una palabra (se evalúa una vez por texto distinto)
+    validos = np.array([len(t.split()) > 1 for t in unicos], dtype=bool)
+    filas = codigos >= 0
+    filas[filas] = validos[codigos[filas]]
+    codigos = codigos[filas]
+    etiquetas, codigos_tema = np.unique(temas, return_inverse=True)
+    codigos_tema = codigos_tema[filas]
+
+    n_textos = np.bincount(codigos_tema, minlength=len(etiquetas))
+    frecuencias = None
+    if validos.any():
+        vectorizer = CountVectorizer()
+        X = vectorizer.fit_transform(unicos)
+        vocabulario = vectorizer.get_feature_names_out()
+        # Filas por (tema, texto distinto) x conteos del texto = frecuencias por tema
+        pesos = sparse.csr_matrix(
+            (np.ones(len(codigos), dtype=np.int64), (codigos_tema, codigos)), shape=(len(etiquetas), len(unicos))
+        )
+        frecuencias = (pesos @ X).toarray()
+
+    palabras = {}
+    for i, tema in enumerate(etiquetas):
+        presentes = np.flatnonzero(frecuencias[i]) if frecuencias is not None else []
+        if n_textos[i] < 2 or not len(presentes):
+            palabras[tema] = "(sin datos suficientes)"
             continue
+        if len(presentes) > n_palabras:
+            presentes = np.sort(presentes[(-frecuencias[i][presentes]).argsort()[:n_palabras]])
+        palabras[tema] = ", ".join(vocabulario[presentes])
+    return palabras
 
-        vectorizer = TfidfVectorizer(max_features=5)
-        X = vectorizer.fit_transform(textos_filtrados)
-        keywords = vectorizer.get_feature_names_out()
-        resultados.append({"tema": tema, "palabras_clave": ", ".join(keywords)})
 
-    df = df.merge(pd.DataFrame(resultados), on="tema", how="left")
-    print("✅ Temas y palabras clave generadas correctamente.")
+def ajustar_kmeans_por_bloques(embeddings, n_clusters: int = N_CLUSTERS, tam_bloque: int = None,
+                               pasadas: int = 3, tam_lote: int = 1024) -> MiniBatchKMeans:
+    """
+    K-means por mini-lotes: recorre los embeddings en bloques de `tam_bloque`
+    filas (varias pasadas, en orden de bloques aleatorio) y actualiza los
+    centroides con `partial_fit` en lotes de `tam_lote`, sin copiar la matriz
+    completa. Funciona igual sobre un memmap o `VectoresPorFila`.
+    """
+    if len(embeddings) < n_clusters:
+        # Mismo error que KMeans: con menos filas que temas el modelo no se puede inicializar
+        raise ValueError(f"n_samples={len(embeddings)} should be >= n_clusters={n_clusters}.")
+    # Bloques y lotes de al menos n_clusters filas: el primer partial_fit inicializa los centroides
+    tam_bloque = max(tam_bloque or settings.TOPIC_CHUNK_SIZE, n_clusters)
+    tam_lote = max(tam_lote, n_clusters)
+    modelo = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=tam_lote)
+    inicios = np.arange(0, len(embeddings), tam_bloque)
+    rng = np.random.default_rng(42)
+    for _ in range(pasadas):
+        for inicio in rng.permutation(inicios):
+            bloque = np.asarray(embeddings[inicio : inicio + tam_bloque], dtype=np.float32)
+            for i in range(0, len(bloque), tam_lote):
+                lote = bloque[i : i + tam_lote]
+                # El primer partial_fit necesita al menos n_clusters filas para inicializar
+                if len(lote) >= n_clusters or hasattr(modelo, "cluster_centers_"):
+                    modelo.partial_fit(lote)
+    return modelo
+
+
+def predecir_por_bloques(modelo, embeddings, tam_bloque: int = None) -> np.ndarray:
+    tam_bloque = tam_bloque or settings.TOPIC_CHUNK_SIZE
+    dtype = modelo.cluster_centers_.dtype
+    return np.concatenate([
+        modelo.predict(np.asarray(embeddings[i : i + tam_bloque], dtype=dtype))
+        for i in range(0, len(embeddings), tam_bloque)
+    ]) if len(embeddings) else np.empty(0, dtype=np.int32)
+
+
+def guardar_modelo_temas(modelo, resultados, path: str = TOPIC_MODEL_PATH):
+    """Persiste el modelo de temas y sus palabras clave para asignar reportes nuevos."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump({
+        "modelo": modelo,
+        "palabras_clave": {int(r["tema"]): r["palabras_clave"] for r in resultados},
+        "embedding_model": EMBEDDING_MODEL,
+    }, path)
+
+
+def actualizar_modelo_temas(embeddings, path: str = TOPIC_MODEL_PATH) -> bool:
+    """
+    Si el modelo de temas guardado es por mini-lotes, ajusta sus centroides con
+    los embeddings nuevos (`partial_fit`) y lo vuelve a guardar. Las palabras
+    clave se conservan hasta la próxima corrida completa.
+    """
+    if not os.path.exists(path) or not len(embeddings):
+        return False
+    guardado = joblib.load(path)
+    if not hasattr(guardado["modelo"], "partial_fit") or guardado["embedding_model"] != EMBEDDING_MODEL:
+        return False
+    guardado["modelo"].partial_fit(np.asarray(embeddings, dtype=guardado["modelo"].cluster_centers_.dtype))
+    joblib.dump(guardado, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    print(f" Centroides de temas actualizados con {len(embeddings)} reportes nuevos (partial_fit).")
+    return True
+
+
+def cargar_modelo_temas(path: str = TOPIC_MODEL_PATH) -> dict:
+    """Modelo de temas persistido: {"modelo", "palabras_clave", "embedding_model"}."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No hay un modelo de temas entrenado en {path}. Ejecuta el pipeline completo.")
+    guardado = joblib.load(path)
+    if guardado["embedding_model"] != EMBEDDING_MODEL:
+        raise ValueError("El modelo de temas se entrenó con otros embeddings. Ejecuta el pipeline completo.")
+    return guardado
+
+
+def asignar_temas(df: pd.DataFrame, embeddings, path: str = TOPIC_MODEL_PATH) -> pd.DataFrame:
+    """Asigna cada fila al centroide más cercano del modelo de temas ya entrenado."""
+    guardado = cargar_modelo_temas(path)
+    df["tema"] = predecir_por_bloques(guardado["modelo"], embeddings)
+    df["palabras_clave"] = df["tema"].map(guardado["palabras_clave"])
     return df
 
 
 # ============================================================
 #  4 ANÁLISIS DE SENTIMIENTOS (Modelo Español BETO)
 # ============================================================
-def analizar_sentimientos(df: pd.DataFrame):
-    print("Analizando sentimientos con modelo español (BETO)...")
-    model_name = "pysentimiento/robertuito-sentiment-analysis"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name)
-    model.eval()
-
-    textos = df["comentario"].fillna("").astype(str).tolist()
-    batch_size = 64
-    preds, probas = [], []
-    labels = {0: "negativo", 1: "neutro", 2: "positivo"}
+def planificar_lotes(longitudes, max_tokens: int) -> list:
+    """
+    Agrupa índices en lotes ordenados por largo de modo que filas x largo
+    máximo del lote (lo que se procesa con padding) no supere `max_tokens`.
+    Un texto más largo que el presupuesto va solo en su lote.
+    """
+    longitudes = np.asarray(longitudes)
+    orden = np.argsort(longitudes, kind="stable")
+    lotes, actual = [], []
+    for i in orden:
+        # Al ir en orden creciente, el texto nuevo define el largo del lote
+        if actual and (len(actual) + 1) * longitudes[i] > max_tokens:
+            lotes.append(actual)
+            actual = []
+        actual.append(int(i))
+    if actual:
+        lotes.append(actual)
+    return lotes
+
 
-    for i in range(0, len(textos), batch_size):
-        batch = textos[i : i + batch_size]
+def inferir_sentimiento(textos: list, tokenizer, model, max_tokens: int = None) -> np.ndarray:
+    """
+    Probabilidades (neg, neu, pos) de cada texto, en el orden de entrada.
+    Se tokeniza una vez sin padding y los lotes se arman por largo con
+    `planificar_lotes`, así un comentario largo no infla el padding de los cortos.
+    """
+    max_tokens = max_tokens or settings.SENTIMENT_TOKEN_BUDGET
+    probas = np.zeros((len(textos), 3), dtype=np.float32)
+    if not textos:
+        return probas
+    codificados = tokenizer(textos, truncation=True, max_length=SENTIMENT_MAX_LENGTH)
+    claves = list(codificados.keys())
+    longitudes = [len(ids) for ids in codificados["input_ids"]]
+
+    lotes = planificar_lotes(longitudes, max_tokens)
+    anotar(lotes=len(lotes), tokens=int(sum(longitudes)))
+    for lote in lotes:
+        features = [{k: codificados[k][i] for k in claves} for i in lote]
         with torch.no_grad():
-            inputs = tokenizer(batch, padding=True, truncation=True, max_length=256, return_tensors="pt")
+            inputs = tokenizer.pad(features, padding=True, return_tensors="pt")
             outputs = model(**inputs)
-            soft = torch.nn.functional.softmax(outputs.logits, dim=1).cpu().numpy()
-        probas.append(soft)
-        preds.extend(soft.argmax(axis=1))
+            probas[lote] = torch.nn.functional.softmax(outputs.logits, dim=1).cpu().numpy()
+    return probas
+
+
+def margen_confianza(probas: np.ndarray) -> np.ndarray:
+    """
+    Diferencia entre la probabilidad más alta y la segunda de cada fila. Es una
+    selección parcial de los dos mayores recorriendo columnas (pocas clases,
+    muchas filas), exacta respecto a ordenar cada fila.
+    """
+    probas = np.asarray(probas)
+    primero = probas[:, 0].copy()
+    segundo = np.full(len(probas), -np.inf, dtype=probas.dtype)
+    for j in range(1, probas.shape[1]):
+        columna = probas[:, j]
+        segundo = np.maximum(segundo, np.minimum(primero, columna))
+        primero = np.maximum(primero, columna)
+    return primero - segundo
 
-    probas = np.vstack(probas)
-    df["sentimiento"] = [labels[p] for p in preds]
+
+def _como_float(valor):
+    """NaN (tabla o grupo vacío) pasa a None para el JSON."""
+    return None if pd.isna(valor) else float(valor)
+
+
+def _resumen_grupos(margen: pd.Series, grupos: pd.Series, nombre: str) -> list:
+    resumen = margen.groupby(grupos, sort=True, observed=True).agg(
+        n="count", media="mean", desviacion="std", mediana="median"
+    ).reset_index().rename(columns={grupos.name: nombre})
+    return resumen.astype(object).where(resumen.notna(), None).to_dict(orient="records")
+
+
+def resumen_confianza(df: pd.DataFrame, percentiles=(5, 25, 50, 75, 95)) -> dict:
+    """
+    Distribución del margen de confianza del modelo de sentimiento: media,
+    desviación, percentiles y promedios por ciudad y por tema. Usa la columna
+    `margen_confianza` si existe y, si no, la calcula desde sent_neg/neu/pos.
+    """
+    if "margen_confianza" in df.columns:
+        margen = df["margen_confianza"].astype(np.float64)
+    else:
+        probas = df[["sent_pos", "sent_neu", "sent_neg"]].to_numpy(dtype=np.float64)
+        margen = pd.Series(margen_confianza(probas), index=df.index)
+
+    validos = margen.dropna().to_numpy()
+    valores = np.percentile(validos, percentiles) if len(validos) else [np.nan] * len(percentiles)
+    resumen = {
+        "n": int(len(validos)),
+        "media": _como_float(margen.mean()),
+        "desviacion": _como_float(margen.std()),
+        "percentiles": {f"p{p}": _como_float(v) for p, v in zip(percentiles, valores)},
+    }
+    for col, clave in (("ciudad", "por_ciudad"), ("tema", "por_tema")):
+        if col in df.columns:
+            resumen[clave] = _resumen_grupos(margen, df[col], col)
+    return resumen
+
+
+def _leer_columnas_confianza() -> pd.DataFrame:
+    """Solo ciudad, tema y margen de themes_nlp (o sus probabilidades en tablas anteriores)."""
+    esquema = esquema_tabla(THEMES_NLP)
+    columnas = ["ciudad", "tema", "margen_confianza"]
+    if esquema is None or "margen_confianza" not in esquema.names:
+        columnas += ["sent_pos", "sent_neu", "sent_neg"]
+    df = leer_tabla(THEMES_NLP, columns=columnas)
+    if "margen_confianza" not in df.columns and not all(
+        col in df.columns for col in ["sent_pos", "sent_neu", "sent_neg"]
+    ):
+        raise ValueError("La tabla themes_nlp no contiene las columnas esperadas.")
+    return df
+
+
+def guardar_resumen_confianza(df: pd.DataFrame = None) -> dict:
+    """
+    Calcula `resumen_confianza` de themes_nlp (o de `df`) y lo guarda en
+    CONFIDENCE_SUMMARY (escritura atómica), para que /metrics solo lo lea.
+    """
+    resumen = resumen_confianza(_leer_columnas_confianza() if df is None else df)
+    with open(CONFIDENCE_SUMMARY + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(resumen, f, ensure_ascii=False)
+    os.replace(CONFIDENCE_SUMMARY + ".tmp", CONFIDENCE_SUMMARY)
+    return resumen
+
+
+def cargar_resumen_confianza() -> dict:
+    """Resumen guardado por el pipeline; si aún no existe se calcula en memoria sin guardarlo."""
+    if os.path.exists(CONFIDENCE_SUMMARY):
+        with open(CONFIDENCE_SUMMARY, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return resumen_confianza(_leer_columnas_confianza())
+
+
+def analizar_sentimientos(df: pd.DataFrame, sanity_check: bool = True, usar_cache: bool = True):
+    """
+    Puntúa cada comentario distinto una sola vez y reparte las probabilidades
+    a sus filas. Las probabilidades (neg, neu, pos) se guardan en una caché en
+    disco por hash del texto y nombre del modelo.
+    """
+    print("Analizando sentimientos con modelo español (BETO)...")
+    model_name = SENTIMENT_MODEL
+
+    codigos, unicos = pd.factorize(df["comentario"].astype(object).fillna("").astype(str), sort=False)
+    unicos = unicos.tolist()
+    hashes = hash_textos(unicos)
+
+    cache = CacheVectores(clave_cache(model_name), "sentimiento") if usar_cache else None
+    if cache is not None and len(cache):
+        probas, encontrados = cache.buscar(hashes)
+    else:
+        probas, encontrados = np.zeros((len(unicos), 3), dtype=np.float32), np.zeros(len(unicos), dtype=bool)
+    faltantes = np.flatnonzero(~encontrados)
+
+    labels = {0: "negativo", 1: "neutro", 2: "positivo"}
+
+    if len(faltantes):
+        # Como en `generar_embeddings`: solo se precarga si la inferencia no se reparte
+        if _inferencia_en_proceso(len(faltantes)):
+            modelo_sentimiento()
+        inicio = time.perf_counter()
+        with medir("inferencia", filas=len(faltantes)):
+            calculadas = inferir_en_paralelo(_fragmento_sentimiento, [unicos[i] for i in faltantes])
+        segundos = time.perf_counter() - inicio
+        probas[faltantes] = calculadas
+        if cache is not None:
+            cache.agregar(hashes[faltantes], calculadas, segundos)
+
+    probas = probas[codigos]
+    df["sentimiento"] = [labels[p] for p in probas.argmax(axis=1)]
     df["sent_neg"] = probas[:, 0]
     df["sent_neu"] = probas[:, 1]
     df["sent_pos"] = probas[:, 2]
+    # Se guarda con la tabla para que /api/metrics no lo recalcule en cada petición
+    df["margen_confianza"] = margen_confianza(probas)
+
+    print(f" Comentarios distintos: {len(unicos)} de {len(df)} filas; puntuados con el modelo: {len(faltantes)}")
+
+    if not sanity_check:
+        print("✅ Análisis de sentimientos completado.")
+        return df
 
     # Sanity check (3 frases rápidas)
     print("\nSanity check:")
+    tokenizer, model = modelo_sentimiento()
     ejemplos = ["Excelente atención", "Muy mala gestión", "Regular el servicio"]
     with torch.no_grad():
         t = tokenizer(ejemplos, padding=True, truncation=True, return_tensors="pt")
@@ -128,18 +646,31 @@ def analizar_sentimientos(df: pd.DataFrame):
 #  5 NLP COMPLETO
 # ============================================================
 def ejecutar_nlp_pipeline():
-    df = cargar_y_preparar_datos("data/clean_data.csv")
-    embeddings = generar_embeddings(df)
-    df = agrupar_y_extraer_temas(df, embeddings, n_clusters=6)
-    df = analizar_sentimientos(df)
+    with medir("preparar"):
+        df = cargar_y_preparar_datos("data/clean_data.csv")
+        anotar(filas=len(df))
+    with medir("paridad_backend"):
+        verificar_paridad_backend(df["comentario"].astype(object).dropna().astype(str).unique().tolist())
+    with medir("embeddings", filas=len(df)):
+        embeddings = generar_embeddings(df)
+    with medir("temas", filas=len(df)):
+        df = agrupar_y_extraer_temas(df, embeddings, n_clusters=N_CLUSTERS)
+    with medir("sentimiento", filas=len(df)):
+        df = analizar_sentimientos(df)
 
     # Guardar resultados combinados
-    df.to_csv("data/themes_nlp.csv", sep=";", encoding="utf-8", index=False)
-    print("Resultados guardados en data/themes_nlp.csv")
+    with medir("guardar", filas=len(df)):
+        guardar_tabla(df, THEMES_NLP)
+        guardar_resumen_confianza(df)
+    print("Resultados guardados en data/themes_nlp.parquet")
 
     # Mostrar y evaluar
     mostrar_resumen(df)
-    evaluar_y_graficar(df, embeddings)
+    with medir("evaluacion", filas=len(df)):
+        # Con mini-lotes las métricas del clustering se miden sobre una muestra
+        # estratificada, para no materializar todos los embeddings
+        muestra = settings.K_SWEEP_FIT_SAMPLE if settings.TOPIC_CLUSTERING == "minibatch" else None
+        evaluar_y_graficar(df, embeddings, modelo=cargar_modelo_temas()["modelo"], muestra_metricas=muestra)
 
     print("\n✅ Proceso NLP completado exitosamente.")
 
@@ -1,6 +1,7 @@
 import os
 import pandas as pd
 from app.infrastructure.openai_gateway import OpenAIGateway
+from app.infrastructure.storage import leer_tabla
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR = os.path.join(BASE_DIR, "data")
@@ -12,8 +13,9 @@ def generar_explicacion_desde_csv() -> str:
 
     # 1 Leer datasets
     try:
-        df_impacto = pd.read_csv(os.path.join(DATA_DIR, "impact_social.csv"), sep=";")
-        df_sent = pd.read_csv(os.path.join(DATA_DIR, "themes_nlp.csv"), sep=";")
+        df_impacto = leer_tabla(os.path.join(DATA_DIR, "impact_social"))
+        df_sent = leer_tabla(os.path.join(DATA_DIR, "themes_nlp"),
+                             columns=["categoria_del_problema", "sent_pos", "sent_neg"])
         print("Datos cargados correctamente.")
     except Exception as e:
         raise FileNotFoundError(f"No se pudieron cargar los CSV: {e}")
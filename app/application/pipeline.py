@@ -1,10 +1,22 @@
 import os
 import shutil
+import time
 import pandas as pd
-from app.application.data_service import run_etl
-from app.application.nlp_service import ejecutar_nlp_pipeline
-from app.application.social_module import load_dataset, compute_social_index
+from app.core.config import settings
+from app.application.data_service import CATEGORY_MAX_RATIO, run_etl
+from app.application.nlp_service import (
+    CONFIDENCE_SUMMARY, EMBEDDING_MODEL, SENTIMENT_MODEL, N_CLUSTERS, ejecutar_nlp_pipeline
+)
+from app.application.social_module import (
+    load_dataset, estadisticos_por_ciudad, agregados_desde_estadisticos, indice_desde_agregados,
+    generate_impact_chart
+)
 from app.application.visual_service import generar_todos_los_graficos
+from app.infrastructure.storage import guardar_tabla, leer_tabla, ruta_parquet, archivos_tabla
+from app.infrastructure.instrumentation import anotar, corrida, medir
+from app.infrastructure.manifest import (
+    cargar_manifiesto, guardar_manifiesto, huella_etapa, etapa_vigente, registrar_etapa
+)
 
 # ==============================
 # RUTAS BASE
@@ -16,59 +28,168 @@ INFRA_VISUALS = os.path.join(BASE_DIR, "app", "infrastructure", "visuals")
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(INFRA_VISUALS, exist_ok=True)
 
+# Tablas y artefactos de cada etapa
+ORIGINAL_CSV = os.path.join(DATA_DIR, "original.csv")
+CLEAN_DATA = os.path.join(DATA_DIR, "clean_data")
+THEMES_NLP = os.path.join(DATA_DIR, "themes_nlp")
+IMPACT_SOCIAL = os.path.join(DATA_DIR, "impact_social")
+SOCIAL_STATS = os.path.join(DATA_DIR, "social_stats")
+FINAL_RESULTS = os.path.join(DATA_DIR, "final_results")
+
+# Etapas de `run_pipeline`, en orden
+ETAPAS = ("etl", "nlp", "social", "integracion", "visualizaciones")
+
+
+def _ejecutar_etapa(manifiesto, nombre, funcion, entradas=(), salidas=(), parametros=None, force=False,
+                    progreso=None) -> bool:
+    """
+    Ejecuta `funcion` solo si cambió la huella de sus entradas/parámetros o
+    faltan sus salidas (o si `force`). Devuelve True si la etapa se ejecutó.
+    `progreso(nombre, estado, segundos)` se llama al empezar ("ejecutando") y
+    al terminar ("ejecutada", "omitida" o "error").
+    """
+    avisar = progreso or (lambda *args: None)
+    inicio = time.perf_counter()
+    avisar(nombre, "ejecutando", 0.0)
+    huella = huella_etapa(manifiesto, entradas, parametros)
+    if not force and etapa_vigente(manifiesto, nombre, huella, salidas):
+        print(f" Sin cambios en las entradas de '{nombre}': se reutilizan sus resultados.")
+        avisar(nombre, "omitida", time.perf_counter() - inicio)
+        return False
+
+    try:
+        with medir(f"etapa[{nombre}]"):
+            funcion()
+    except Exception:
+        avisar(nombre, "error", time.perf_counter() - inicio)
+        raise
+    registrar_etapa(manifiesto, nombre, huella, salidas)
+    guardar_manifiesto(manifiesto)
+    avisar(nombre, "ejecutada", time.perf_counter() - inicio)
+    return True
+
+
 # ==============================
 # PIPELINE COMPLETO
 # ==============================
-def run_pipeline():
+def run_pipeline(force: bool = False, progreso=None):
+    """
+    Ejecuta el pipeline completo. Cada etapa registra en el manifiesto la
+    huella de sus entradas y se omite si no cambiaron; `force=True` lo
+    ejecuta todo de nuevo. `progreso` recibe el avance de cada etapa (ver
+    `_ejecutar_etapa`). Tiempos, CPU, memoria y filas de cada etapa y paso
+    quedan en data/metrics (ver `instrumentation`).
+    """
+    with corrida("pipeline", force=force):
+        _run_pipeline(force, progreso)
+
+
+def _run_pipeline(force: bool, progreso):
     print("Iniciando pipeline completo de CivIA...\n")
+    manifiesto = cargar_manifiesto()
 
     # -------------------------------------------------
     # 1 ETL: limpieza y normalización de datos
     # -------------------------------------------------
     print("Paso 1: Ejecutando limpieza de datos (ETL)...")
-    run_etl()
+    _ejecutar_etapa(
+        manifiesto, "etl",
+        lambda: run_etl(chunksize=settings.ETL_CHUNK_SIZE or None),
+        entradas=[ORIGINAL_CSV],
+        salidas=[ruta_parquet(CLEAN_DATA)],
+        parametros={"category_max_ratio": CATEGORY_MAX_RATIO},
+        force=force,
+        progreso=progreso,
+    )
 
     # -------------------------------------------------
     # 2 Análisis de temas y sentimientos (NLP)
     # -------------------------------------------------
     print("\nPaso 2: Analizando temas y sentimientos...")
-    ejecutar_nlp_pipeline()
+    _ejecutar_etapa(
+        manifiesto, "nlp",
+        ejecutar_nlp_pipeline,
+        entradas=archivos_tabla(CLEAN_DATA),
+        salidas=[ruta_parquet(THEMES_NLP), CONFIDENCE_SUMMARY],
+        parametros={
+            "embedding_model": EMBEDDING_MODEL,
+            "sentiment_model": SENTIMENT_MODEL,
+            "n_clusters": N_CLUSTERS,
+            "backend": settings.NLP_BACKEND,
+            "clustering": settings.TOPIC_CLUSTERING,
+        },
+        force=force,
+        progreso=progreso,
+    )
 
     # -------------------------------------------------
     # 3 Análisis de vulnerabilidad e impacto social
     # -------------------------------------------------
     print("\nPaso 3: Calculando vulnerabilidad e impacto social...")
-    df = load_dataset(os.path.join(DATA_DIR, "clean_data.csv"))
-    social_df = compute_social_index(df)
-    impact_path = os.path.join(DATA_DIR, "impact_social.csv")
-    social_df.to_csv(impact_path, sep=";", encoding="utf-8", index=False)
-    print(f"Archivo guardado: {impact_path}")
+
+    def etapa_social():
+        # Sumas y conteos por ciudad: la API deriva de aquí patrones e índice y la ingesta los actualiza
+        reportes = load_dataset(CLEAN_DATA + ".csv")
+        anotar(filas=len(reportes))
+        estadisticos = estadisticos_por_ciudad(reportes)
+        guardar_tabla(estadisticos, SOCIAL_STATS)
+        social_df = indice_desde_agregados(agregados_desde_estadisticos(estadisticos))
+        guardar_tabla(social_df, IMPACT_SOCIAL)
+        print(f"Archivo guardado: {IMPACT_SOCIAL}.parquet")
+        try:
+            generate_impact_chart(social_df)
+        except Exception as e:
+            print("No se pudo generar el gráfico:", e)
+
+    _ejecutar_etapa(
+        manifiesto, "social", etapa_social,
+        entradas=archivos_tabla(CLEAN_DATA),
+        salidas=[ruta_parquet(IMPACT_SOCIAL), ruta_parquet(SOCIAL_STATS)],
+        force=force,
+        progreso=progreso,
+    )
 
     # -------------------------------------------------
     # 4 Integrar resultados NLP + Social
     # -------------------------------------------------
     print("\n Paso 4: Integrando resultados finales...")
-    nlp_df = pd.read_csv(os.path.join(DATA_DIR, "themes_nlp.csv"), sep=";")
 
-    merged = pd.merge(social_df, nlp_df, on="ciudad", how="left")
-    merged_path = os.path.join(DATA_DIR, "final_results.csv")
-    merged.to_csv(merged_path, sep=";", encoding="utf-8", index=False)
-    print(f" Archivo unificado generado: {merged_path}")
+    def etapa_integracion():
+        social_df = leer_tabla(IMPACT_SOCIAL)
+        nlp_df = leer_tabla(THEMES_NLP)
+
+        merged = pd.merge(social_df, nlp_df, on="ciudad", how="left")
+        anotar(filas=len(merged))
+        guardar_tabla(merged, FINAL_RESULTS)
+        print(f" Archivo unificado generado: {FINAL_RESULTS}.parquet")
+
+    _ejecutar_etapa(
+        manifiesto, "integracion", etapa_integracion,
+        entradas=[ruta_parquet(IMPACT_SOCIAL)] + archivos_tabla(THEMES_NLP),
+        salidas=[ruta_parquet(FINAL_RESULTS)],
+        force=force,
+        progreso=progreso,
+    )
 
     # -------------------------------------------------
     # 5 Generar visualizaciones finales
     # -------------------------------------------------
     print("\n Paso 5: Generando visualizaciones sociales...")
-    output_visuals = os.path.join(BASE_DIR, "app", "infrastructure", "visuals")
-    rutas = generar_todos_los_graficos(output_visuals)
-    print(" Gráficos generados:", rutas)
-    # -------------------------------------------------
-    # 6 Copiar visualizaciones a carpeta del dashboard
-    # -------------------------------------------------
-    print("\n Paso 6: Actualizando dashboard...")
-    rutas = generar_todos_los_graficos(INFRA_VISUALS)
+
+    def etapa_visualizaciones():
+        # Una sola pasada: el dashboard sirve las imágenes desde INFRA_VISUALS
+        rutas = generar_todos_los_graficos(INFRA_VISUALS, forzar=force)
+        print(" Gráficos generados:", rutas)
+
+    _ejecutar_etapa(
+        manifiesto, "visualizaciones", etapa_visualizaciones,
+        entradas=[f for t in (CLEAN_DATA, THEMES_NLP, IMPACT_SOCIAL) for f in archivos_tabla(t)],
+        salidas=[INFRA_VISUALS],
+        force=force,
+        progreso=progreso,
+    )
     # -------------------------------------------------
-    # 7 Confirmar finalización
+    # 6 Confirmar finalización
     # -------------------------------------------------
     print("\nPipeline completado exitosamente.")
     print(f"Resultados disponibles en: {DATA_DIR}")
@@ -76,4 +197,5 @@ def run_pipeline():
 
 
 if __name__ == "__main__":
-    run_pipeline()
+    import sys
+    run_pipeline(force="--force" in sys.argv)
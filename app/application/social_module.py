@@ -2,22 +2,27 @@ import pandas as pd
 import numpy as np
 import os
 import matplotlib.pyplot as plt
+from app.application.data_service import categorizar_columnas
+from app.infrastructure.storage import existe_tabla, leer_tabla, ruta_parquet
 
 # =========================================
 # 1️ CARGA Y NORMALIZACIÓN DE DATOS
 # =========================================
 def load_dataset(path: str) -> pd.DataFrame:
-    """Carga el dataset, detecta separador y normaliza columnas."""
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"No se encontró el archivo: {os.path.abspath(path)}")
-
-    with open(path, "r", encoding="utf-8-sig") as f:
-        sample = f.readline()
-        sep = ";" if ";" in sample else ","
-
-    df = pd.read_csv(path, encoding="utf-8-sig", sep=sep)
+    """Carga el dataset (Parquet si existe; si no, CSV detectando separador) y normaliza columnas."""
+    if os.path.exists(ruta_parquet(path)):
+        df = leer_tabla(path)
+    else:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No se encontró el archivo: {os.path.abspath(path)}")
+
+        with open(path, "r", encoding="utf-8-sig") as f:
+            sample = f.readline()
+            sep = ";" if ";" in sample else ","
+
+        df = pd.read_csv(path, encoding="utf-8-sig", sep=sep)
     df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-    return df
+    return categorizar_columnas(df)
 
 
 def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
@@ -28,7 +33,7 @@ def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
 
     # --- Normalizar nivel de urgencia ---
     if "nivel_de_urgencia" in df.columns:
-        if df["nivel_de_urgencia"].dtype == "object":
+        if not pd.api.types.is_numeric_dtype(df["nivel_de_urgencia"]):
             # Si son textos tipo “urgente” o “no urgente”
             df["nivel_de_urgencia"] = (
                 df["nivel_de_urgencia"]
@@ -55,23 +60,109 @@ def normalize_data(df: pd.DataFrame) -> pd.DataFrame:
 # =========================================
 # 2️ ÍNDICE DE VULNERABILIDAD SOCIAL
 # =========================================
-def analyze_social_patterns(df: pd.DataFrame) -> pd.DataFrame:
-    """Combina factores sociales y urgencia y clasifica con umbrales dinámicos."""
-    df = normalize_data(df)
+BASE_COLS = ["acceso_a_internet", "atencion_previa_del_gobierno", "zona_rural"]
+
+
+METRICAS = ["vulnerabilidad", "nivel_de_urgencia"] + BASE_COLS
 
+
+def _normalizar_por_valores(serie: pd.Series) -> np.ndarray:
+    """
+    Aplica `normalize_data` a los valores distintos de la columna (más un nulo)
+    y reparte el resultado a las filas por sus códigos: mismo valor que fila a
+    fila, como float (los valores no numéricos quedan en NaN).
+    """
+    codigos, distintos = pd.factorize(serie, sort=False)
+    # El nulo va al final: las filas nulas (código -1) toman ese valor
+    valores = pd.Series(distintos).reindex(range(len(distintos) + 1))
+    normalizados = normalize_data(pd.DataFrame({serie.name: valores}))[serie.name]
+    return pd.to_numeric(normalizados, errors="coerce").to_numpy(dtype=float)[codigos]
+
+
+def estadisticos_por_ciudad(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estadísticos suficientes por ciudad en una sola pasada: número de reportes
+    y, para cada métrica, la suma y el número de valores no nulos. Las
+    columnas se normalizan por valores distintos y se acumulan con
+    `np.bincount` sobre los códigos de ciudad.
+    """
+    df = df.rename(columns=lambda c: c.strip().lower().replace(" ", "_"))
+    codigos, ciudades = pd.factorize(df["ciudad"], sort=False)
+    validos = codigos >= 0
+    n = len(ciudades)
+
+    valores = {col: _normalizar_por_valores(df[col]) for col in ["nivel_de_urgencia"] + BASE_COLS}
     # Vulnerabilidad estructural (0–1). Ponderaciones ajustables.
-    df["vulnerabilidad"] = (
-        (1 - df["acceso_a_internet"]) * 0.4 +
-        (1 - df["atencion_previa_del_gobierno"]) * 0.3 +
-        df["zona_rural"] * 0.3
+    valores["vulnerabilidad"] = (
+        (1 - valores["acceso_a_internet"]) * 0.4 +
+        (1 - valores["atencion_previa_del_gobierno"]) * 0.3 +
+        valores["zona_rural"] * 0.3
     )
 
-    # Agrupar por ciudad
-    summary = df.groupby("ciudad", dropna=True).agg(
-        vulnerabilidad=("vulnerabilidad", "mean"),
-        nivel_de_urgencia=("nivel_de_urgencia", "mean"),
-        n_reportes=("id", "count")
-    ).reset_index()
+    estadisticos = {"ciudad": np.asarray(ciudades, dtype=object)}
+    con_id = validos & df["id"].notna().to_numpy()
+    estadisticos["n_reportes"] = np.bincount(codigos[con_id], minlength=n)
+    for col in METRICAS:
+        ok = validos & ~np.isnan(valores[col])
+        estadisticos[f"suma_{col}"] = np.bincount(codigos[ok], weights=valores[col][ok], minlength=n)
+        estadisticos[f"n_{col}"] = np.bincount(codigos[ok], minlength=n)
+    return pd.DataFrame(estadisticos).sort_values("ciudad").reset_index(drop=True)
+
+
+def agregados_desde_estadisticos(estadisticos: pd.DataFrame) -> pd.DataFrame:
+    """Promedios por ciudad a partir de sumas y conteos (costo O(ciudades))."""
+    agregados = pd.DataFrame({"ciudad": estadisticos["ciudad"].astype(object)})
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for col in ["vulnerabilidad", "nivel_de_urgencia"]:
+            agregados[col] = estadisticos[f"suma_{col}"] / estadisticos[f"n_{col}"].where(estadisticos[f"n_{col}"] > 0)
+        agregados["n_reportes"] = estadisticos["n_reportes"].astype("int64")
+        for col in BASE_COLS:
+            agregados[col] = estadisticos[f"suma_{col}"] / estadisticos[f"n_{col}"].where(estadisticos[f"n_{col}"] > 0)
+    return agregados.sort_values("ciudad").reset_index(drop=True)
+
+
+def sumar_estadisticos(*tablas: pd.DataFrame) -> pd.DataFrame:
+    """Combina tablas de estadísticos por ciudad (p. ej. la guardada + un bloque nuevo) sumándolas."""
+    no_vacias = [t for t in tablas if t is not None and len(t)]
+    if not no_vacias:
+        return next((t for t in tablas if t is not None), pd.DataFrame())
+    combinadas = pd.concat(no_vacias, ignore_index=True)
+    combinadas["ciudad"] = combinadas["ciudad"].astype(object)
+    return combinadas.groupby("ciudad", sort=True).sum().reset_index()
+
+
+def cargar_estadisticos(path: str, datos: str = None) -> pd.DataFrame:
+    """
+    Lee la tabla de estadísticos por ciudad que mantiene el pipeline. Si no
+    existe y se indica `datos` (dataset limpio), la calcula en memoria sin
+    escribirla: solo el pipeline y la ingesta, con el bloqueo de datos, la guardan.
+    """
+    if existe_tabla(path):
+        return leer_tabla(path)
+    if datos is None:
+        raise FileNotFoundError(f"No se encontró la tabla de estadísticos: {os.path.abspath(path)}")
+    return estadisticos_por_ciudad(load_dataset(datos))
+
+
+def _agregados(df: pd.DataFrame) -> pd.DataFrame:
+    """Acepta filas de reportes o la tabla de estadísticos por ciudad."""
+    if "suma_vulnerabilidad" in df.columns:
+        return agregados_desde_estadisticos(df)
+    return agregados_por_ciudad(df)
+
+
+def agregados_por_ciudad(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Promedios por ciudad (sin normalizar entre ciudades) de vulnerabilidad,
+    urgencia y factores base, más el número de reportes. Es todo lo que
+    necesitan `analyze_social_patterns` y `compute_social_index`.
+    """
+    return agregados_desde_estadisticos(estadisticos_por_ciudad(df))
+
+
+def clasificar_patrones(agregados: pd.DataFrame) -> pd.DataFrame:
+    """Clasifica cada ciudad según umbrales dinámicos de vulnerabilidad y urgencia."""
+    summary = agregados[["ciudad", "vulnerabilidad", "nivel_de_urgencia", "n_reportes"]].copy()
 
     # --- UMBRALES DINÁMICOS (cuantiles) ---
     # Si tienes pocas ciudades, usa mediana (0.5). Con más ciudades, 0.65 da mejor contraste.
@@ -111,18 +202,13 @@ def analyze_social_patterns(df: pd.DataFrame) -> pd.DataFrame:
 
     return summary[["ciudad", "vulnerabilidad", "nivel_de_urgencia", "patron_social", "n_reportes"]]
 
-def compute_social_index(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Calcula el índice de impacto social combinando factores estructurales (vulnerabilidad),
-    de acceso y contexto (internet, atención, ruralidad) y urgencia.
-    """
-    summary = analyze_social_patterns(df)
 
-    # Unir datos base para tener acceso_a_internet, etc.
-    base_cols = ["ciudad", "acceso_a_internet", "atencion_previa_del_gobierno", "zona_rural"]
-    base_info = df[base_cols].groupby("ciudad", as_index=False).mean()
+def indice_desde_agregados(agregados: pd.DataFrame) -> pd.DataFrame:
+    """Índice de impacto social a partir de los agregados por ciudad (costo O(ciudades))."""
+    summary = clasificar_patrones(agregados)
 
-    summary = summary.merge(base_info, on="ciudad", how="left")
+    # Unir datos base para tener acceso_a_internet, etc.
+    summary = summary.merge(agregados[["ciudad"] + BASE_COLS], on="ciudad", how="left")
 
     # Normalizar de 0 a 1 para evitar sesgos
     for col in ["vulnerabilidad", "nivel_de_urgencia", "acceso_a_internet", "atencion_previa_del_gobierno", "zona_rural"]:
@@ -140,12 +226,6 @@ def compute_social_index(df: pd.DataFrame) -> pd.DataFrame:
     # Redondeo solo al final
     summary["impacto_social"] = summary["impacto_social"].round(3)
 
-    # Generar gráfico
-    try:
-        generate_impact_chart(summary)
-    except Exception as e:
-        print("No se pudo generar el gráfico:", e)
-
     # Ordenar por impacto descendente
     return summary[[
         "ciudad", "vulnerabilidad", "nivel_de_urgencia",
@@ -153,6 +233,33 @@ def compute_social_index(df: pd.DataFrame) -> pd.DataFrame:
     ]].sort_values("impacto_social", ascending=False).reset_index(drop=True)
 
 
+def analyze_social_patterns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combina factores sociales y urgencia y clasifica con umbrales dinámicos.
+    `df` puede ser el dataset de reportes o la tabla de estadísticos por ciudad.
+    """
+    return clasificar_patrones(_agregados(df))
+
+
+def compute_social_index(df: pd.DataFrame, generar_grafico: bool = True) -> pd.DataFrame:
+    """
+    Calcula el índice de impacto social combinando factores estructurales (vulnerabilidad),
+    de acceso y contexto (internet, atención, ruralidad) y urgencia.
+    `df` puede ser el dataset de reportes o la tabla de estadísticos por ciudad.
+    La API pasa `generar_grafico=False`: el gráfico lo genera el pipeline.
+    """
+    summary = indice_desde_agregados(_agregados(df))
+
+    # Generar gráfico
+    if generar_grafico:
+        try:
+            generate_impact_chart(summary)
+        except Exception as e:
+            print("No se pudo generar el gráfico:", e)
+
+    return summary
+
+
 def generate_impact_chart(summary: pd.DataFrame, output_path="data/visuals/impact_chart.png"):
     """Genera un gráfico de barras del impacto social."""
     import matplotlib.pyplot as plt
@@ -1,23 +1,101 @@
+import hashlib
+import io
+import json
+import multiprocessing as mp
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
 import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.infrastructure.instrumentation import medir
+from app.infrastructure.storage import CSV_NA_VALUES, archivos_tabla, leer_tabla, ruta_csv
 
 # ==============================
 #  RUTAS BASE
 # ==============================
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR = os.path.join(BASE_DIR, "data")
+# Huella de los datos de cada gráfico ya dibujado (por carpeta de salida)
+CHART_CACHE = os.path.join(DATA_DIR, "cache", "graficos.json")
+# Series de cada gráfico en JSON (las sirve la API para dibujar en el cliente)
+CHART_DATA = os.path.join(DATA_DIR, "chart_data.json")
+
+# Estadísticos aditivos de los gráficos (conteos y sumas; ver ESTADISTICOS)
+CHART_STATS = os.path.join(DATA_DIR, "chart_stats.json")
+
+# Columnas que necesitan los gráficos de cada tabla: cada tabla se lee una sola vez
+TABLAS = {
+    "impact_social": ["ciudad", "impacto_social", "patron_social"],
+    "clean_data": ["acceso_a_internet", "nivel_de_urgencia", "genero"],
+    "themes_nlp": ["ciudad", "categoria_del_problema", "sent_pos", "sent_neu", "sent_neg", "palabras_clave"],
+}
+
+# Conteos y sumas de los que salen los gráficos: nombre -> (tabla, claves, columnas
+# sumadas). Se combinan sumándolos, así la ingesta solo cuenta el bloque nuevo.
+ESTADISTICOS = {
+    "categoria_ciudad": ("themes_nlp", ["categoria_del_problema", "ciudad"], []),
+    "internet_urgencia": ("clean_data", ["acceso_a_internet", "nivel_de_urgencia"], []),
+    "genero": ("clean_data", ["genero"], []),
+    "sentimiento_ciudad": ("themes_nlp", ["ciudad"], ["sent_pos", "sent_neu", "sent_neg"]),
+    "temas": ("themes_nlp", ["palabras_clave"], []),
+}
+
+
+# Formatos de imagen que se pueden pedir a la API
+FORMATOS_IMAGEN = {"png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+
+
+def _figura(figsize=None):
+    """
+    Figura propia (canvas Agg) fuera del estado global de pyplot: la API
+    dibuja en hilos concurrentes y cada petición usa su figura.
+    """
+    fig = Figure(figsize=figsize)
+    return fig, fig.subplots()
+
+
+def _guardar_figura(fig, destino, formato: str = "png", ancho: int = None):
+    """
+    Guarda `fig` en `destino` (ruta o buffer). `ancho` en píxeles ajusta los
+    dpi sin cambiar la composición. En disco la escritura es atómica: el
+    dashboard nunca ve una imagen a medio escribir.
+    """
+    dpi = ancho / fig.get_figwidth() if ancho else None
+    if isinstance(destino, str):
+        fig.savefig(destino + ".tmp", format=formato, dpi=dpi)
+        os.replace(destino + ".tmp", destino)
+    else:
+        fig.savefig(destino, format=formato, dpi=dpi)
+
 
 # ==============================
 #  FUNCIONES DE VISUALIZACIÓN
 # ==============================
+# Cada gráfico tiene dos partes: `datos_*` reduce a lo que se dibuja el índice
+# por ciudad y los estadísticos aditivos (`fuentes`, ver ESTADISTICOS; barato, en
+# el proceso principal) y `grafico_*` lo dibuja en `path` (`opciones`: formato y
+# ancho, ver `_guardar_figura`).
+
+def _conteos(estadistico: pd.DataFrame, clave: str) -> pd.Series:
+    """Conteos por `clave` de mayor a menor, como `value_counts`."""
+    conteos = estadistico.groupby(clave, sort=True)["n"].sum().rename("count")
+    return conteos.sort_values(ascending=False, kind="stable")
+
 
-def grafico_impacto_por_ciudad(output_dir):
+def datos_impacto_por_ciudad(fuentes):
+    return fuentes["impact_social"].set_index("ciudad")[["impacto_social", "patron_social"]].sort_values(
+        "impacto_social", ascending=True, kind="stable"
+    )
+
+
+def grafico_impacto_por_ciudad(df, path, **opciones):
     """ Promedio de impacto social por ciudad."""
-    df = pd.read_csv(os.path.join(DATA_DIR, "impact_social.csv"), sep=";")
-    plt.figure(figsize=(8, 5))
-    df = df.sort_values("impacto_social", ascending=True)
+    fig, ax = _figura((8, 5))
     colores = df["patron_social"].map({
         "Zona crítica": "#E63946",
         "Zona invisible": "#F4D35E",
@@ -25,132 +103,414 @@ def grafico_impacto_por_ciudad(output_dir):
         "Estable": "#35DBB8"
     }).fillna("#999")
 
-    plt.barh(df["ciudad"], df["impacto_social"], color=colores)
-    plt.title("Impacto social promedio por ciudad")
-    plt.xlabel("Índice de impacto social (0–1)")
-    plt.tight_layout()
-    path = os.path.join(output_dir, "impacto_por_ciudad.png")
-    plt.savefig(path)
-    plt.close()
-    return path
+    ax.barh(df.index, df["impacto_social"], color=colores)
+    ax.set_title(TITULOS["impacto_por_ciudad"])
+    ax.set_xlabel("Índice de impacto social (0–1)")
+    fig.tight_layout()
+    _guardar_figura(fig, path, **opciones)
 
-def grafico_categorias_impacto(output_dir):
-    """Categorías con mayor impacto social según IA."""
-    df = pd.read_csv(os.path.join(DATA_DIR, "final_results.csv"), sep=";")
-    if "categoria_del_problema" not in df.columns:
+
+def datos_categorias_impacto(fuentes):
+    # Promedio del impacto de la ciudad de cada reporte (como en final_results),
+    # con el índice vigente y los reportes por categoría y ciudad
+    conteos = fuentes["categoria_ciudad"]
+    if conteos is None:
         return None
-    top = df.groupby("categoria_del_problema")["impacto_social"].mean().sort_values(ascending=False).head(8)
-    plt.figure(figsize=(9, 5))
-    top.plot(kind="bar", color="#b40000")
-    plt.title("Categorías con mayor impacto social (IA + Social)")
-    plt.ylabel("Promedio de impacto social")
-    plt.xlabel("Categoría del problema")
-    plt.tight_layout()
-    path = os.path.join(output_dir, "categorias_impacto.png")
-    plt.savefig(path)
-    plt.close()
-    return path
-
-
-def grafico_internet_vs_urgencia(output_dir):
+    impacto = conteos["ciudad"].map(fuentes["impact_social"].set_index("ciudad")["impacto_social"])
+    n = conteos["n"].where(impacto.notna(), 0)
+    categorias = conteos["categoria_del_problema"]
+    suma = (n * impacto.fillna(0.0)).groupby(categorias, sort=True).sum()
+    total = n.groupby(categorias, sort=True).sum()
+    media = (suma / total.where(total > 0)).rename("impacto_social")
+    return media.sort_values(ascending=False, kind="stable").head(8)
+
+
+def grafico_categorias_impacto(top, path, **opciones):
+    """Categorías con mayor impacto social según IA."""
+    fig, ax = _figura((9, 5))
+    top.plot(kind="bar", color="#b40000", ax=ax)
+    ax.set_title(TITULOS["categorias_impacto"])
+    ax.set_ylabel("Promedio de impacto social")
+    ax.set_xlabel("Categoría del problema")
+    fig.tight_layout()
+    _guardar_figura(fig, path, **opciones)
+
+
+def datos_internet_vs_urgencia(fuentes):
+    conteos = fuentes["internet_urgencia"].copy()
+    conteos["nivel_de_urgencia"] = conteos["nivel_de_urgencia"].str.lower()
+    grouped = conteos.groupby(["acceso_a_internet", "nivel_de_urgencia"])["n"].sum().rename("count")
+    return grouped.unstack().fillna(0)
+
+
+def grafico_internet_vs_urgencia(grouped, path, **opciones):
     """ Acceso a internet vs nivel de urgencia."""
-    df = pd.read_csv(os.path.join(DATA_DIR, "clean_data.csv"), sep=";")
-    df["nivel_de_urgencia"] = df["nivel_de_urgencia"].str.lower()
-    grouped = df.groupby("acceso_a_internet")["nivel_de_urgencia"].value_counts().unstack().fillna(0)
-    grouped.plot(kind="bar", stacked=True, color=["#b40000", "#ccc"])
-    plt.title("Acceso a internet vs nivel de urgencia")
-    plt.xlabel("Acceso a internet (0 = No, 1 = Sí)")
-    plt.ylabel("Cantidad de reportes")
-    plt.tight_layout()
-    path = os.path.join(output_dir, "internet_vs_urgencia.png")
-    plt.savefig(path)
-    plt.close()
-    return path
-
-
-def grafico_reportes_por_genero(output_dir):
+    fig, ax = _figura()
+    grouped.plot(kind="bar", stacked=True, color=["#b40000", "#ccc"], ax=ax)
+    ax.set_title(TITULOS["internet_vs_urgencia"])
+    ax.set_xlabel("Acceso a internet (0 = No, 1 = Sí)")
+    ax.set_ylabel("Cantidad de reportes")
+    fig.tight_layout()
+    _guardar_figura(fig, path, **opciones)
+
+
+def datos_reportes_por_genero(fuentes):
+    return _conteos(fuentes["genero"], "genero")
+
+
+def grafico_reportes_por_genero(generos, path, **opciones):
     """ Distribución de reportes por género."""
-    df = pd.read_csv(os.path.join(DATA_DIR, "clean_data.csv"), sep=";")
-    generos = df["genero"].value_counts()
     colores = ["#b40000", "#F4D35E", "#35DBB8"]
-    plt.figure(figsize=(5, 5))
-    generos.plot(kind="pie", autopct="%1.1f%%", colors=colores)
-    plt.title("Distribución de reportes por género")
-    plt.ylabel("")
-    plt.tight_layout()
-    path = os.path.join(output_dir, "reportes_por_genero.png")
-    plt.savefig(path)
-    plt.close()
-    return path
+    fig, ax = _figura((5, 5))
+    generos.plot(kind="pie", autopct="%1.1f%%", colors=colores, ax=ax)
+    ax.set_title(TITULOS["reportes_por_genero"])
+    ax.set_ylabel("")
+    fig.tight_layout()
+    _guardar_figura(fig, path, **opciones)
 
 """
     NLP- Sentimientos y capas ocultas en la urgencia y comentarios
 """
 
-def grafico_sentimiento_promedio(output_dir):
-    """Distribución de sentimientos (positivo, neutro, negativo) por ciudad."""
-    df = pd.read_csv(os.path.join(DATA_DIR, "themes_nlp.csv"), sep=";")
+def datos_sentimiento_promedio(fuentes):
+    sumas = fuentes["sentimiento_ciudad"].set_index("ciudad")
 
-    # Agrupar promedios por ciudad
-    resumen = df.groupby("ciudad")[["sent_pos", "sent_neu", "sent_neg"]].mean().dropna()
+    # Promedios por ciudad (suma / valores no nulos)
+    resumen = pd.DataFrame({
+        col: sumas[f"suma_{col}"] / sumas[f"n_{col}"].where(sumas[f"n_{col}"] > 0)
+        for col in ["sent_pos", "sent_neu", "sent_neg"]
+    }).dropna()
 
     # Normalizar para que las tres columnas sumen 1 por ciudad (proporción)
     resumen = resumen.div(resumen.sum(axis=1), axis=0)
 
     # Ordenar por ciudades con más positividad
-    resumen = resumen.sort_values("sent_pos", ascending=False).head(10)
+    return resumen.sort_values("sent_pos", ascending=False, kind="stable").head(10)
+
 
+def grafico_sentimiento_promedio(resumen, path, **opciones):
+    """Distribución de sentimientos (positivo, neutro, negativo) por ciudad."""
     # Colores institucionales
     colores = ["#2ECC71", "#F4D35E", "#E74C3C"]
 
     # Crear gráfico apilado horizontal
-    resumen.plot(kind="barh", stacked=True, color=colores, figsize=(9, 5))
-    plt.title("Distribución de sentimientos promedio por ciudad")
-    plt.xlabel("Proporción de comentarios (%)")
-    plt.ylabel("Ciudad")
-    plt.legend(["Positivo", "Neutro", "Negativo"], loc="lower right")
-    plt.tight_layout()
+    fig, ax = _figura((9, 5))
+    resumen.plot(kind="barh", stacked=True, color=colores, ax=ax)
+    ax.set_title(TITULOS["sentimiento_promedio"])
+    ax.set_xlabel("Proporción de comentarios (%)")
+    ax.set_ylabel("Ciudad")
+    ax.legend(["Positivo", "Neutro", "Negativo"], loc="lower right")
+    fig.tight_layout()
+    _guardar_figura(fig, path, **opciones)
+
 
-    path = os.path.join(output_dir, "sentimiento_promedio.png")
-    plt.savefig(path)
-    plt.close()
-    return path
+def datos_temas_detectados(fuentes):
+    return _conteos(fuentes["temas"], "palabras_clave").head(10)
 
 
-def grafico_temas_detectados(output_dir):
+def grafico_temas_detectados(top, path, **opciones):
     """Temas detectados por IA (NLP clustering)."""
-    df = pd.read_csv(os.path.join(DATA_DIR, "themes_nlp.csv"), sep=";")
-    top = df["palabras_clave"].value_counts().head(10)
-    plt.figure(figsize=(9, 5))
-    top.plot(kind="barh", color="#b40000")
-    plt.title("Temas detectados por IA")
-    plt.xlabel("Cantidad de comentarios agrupados")
-    plt.tight_layout()
-    path = os.path.join(output_dir, "temas_detectados.png")
-    plt.savefig(path)
-    plt.close()
-    return path
+    fig, ax = _figura((9, 5))
+    top.plot(kind="barh", color="#b40000", ax=ax)
+    ax.set_title(TITULOS["temas_detectados"])
+    ax.set_xlabel("Cantidad de comentarios agrupados")
+    fig.tight_layout()
+    _guardar_figura(fig, path, **opciones)
+
+
+# Nombre del archivo -> (datos, dibujo)
+GRAFICOS = {
+    "impacto_por_ciudad": (datos_impacto_por_ciudad, grafico_impacto_por_ciudad),
+    "categorias_impacto": (datos_categorias_impacto, grafico_categorias_impacto),
+    "internet_vs_urgencia": (datos_internet_vs_urgencia, grafico_internet_vs_urgencia),
+    "reportes_por_genero": (datos_reportes_por_genero, grafico_reportes_por_genero),
+    "sentimiento_promedio": (datos_sentimiento_promedio, grafico_sentimiento_promedio),
+    "temas_detectados": (datos_temas_detectados, grafico_temas_detectados),
+}
+
+# Título de cada gráfico (en la imagen y en sus series JSON)
+TITULOS = {
+    "impacto_por_ciudad": "Impacto social promedio por ciudad",
+    "categorias_impacto": "Categorías con mayor impacto social (IA + Social)",
+    "internet_vs_urgencia": "Acceso a internet vs nivel de urgencia",
+    "reportes_por_genero": "Distribución de reportes por género",
+    "sentimiento_promedio": "Distribución de sentimientos promedio por ciudad",
+    "temas_detectados": "Temas detectados por IA",
+}
+
+
+# ==============================
+#  DATOS DE LOS GRÁFICOS
+# ==============================
+def cargar_tablas() -> dict:
+    """Lee una vez cada tabla con las columnas que usan todos sus gráficos."""
+    return {nombre: leer_tabla(os.path.join(DATA_DIR, nombre), columns=cols) for nombre, cols in TABLAS.items()}
+
+
+def _sin_vacios(serie: pd.Series) -> pd.Series:
+    """Textos que la tabla guardada leería como nulos (ver `CSV_NA_VALUES`)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype == "object":
+        return serie.astype(object).where(~serie.isin(CSV_NA_VALUES))
+    return serie
+
+
+def estadisticos_graficos(tablas: dict) -> dict:
+    """
+    Conteos y sumas de ESTADISTICOS sobre `tablas` (completas o solo un bloque
+    nuevo). Los que dependen de una tabla ausente no se incluyen; los que
+    necesitan columnas que la tabla no tiene quedan en None.
+    """
+    estadisticos = {}
+    for nombre, (tabla, claves, sumadas) in ESTADISTICOS.items():
+        if tabla not in tablas:
+            continue
+        df = tablas[tabla]
+        if any(c not in df.columns for c in claves + sumadas):
+            estadisticos[nombre] = None
+            continue
+        df = df[claves + sumadas].assign(
+            **{c: _sin_vacios(df[c]) for c in claves},
+            # Las sumas se acumulan entre ingestas: en float64 aunque la tabla use float32
+            **{c: df[c].astype("float64") for c in sumadas},
+        )
+        grupos = df.groupby(claves, sort=True)
+        estadistico = grupos.size().rename("n").to_frame()
+        for col in sumadas:
+            estadistico[f"suma_{col}"] = grupos[col].sum()
+            estadistico[f"n_{col}"] = grupos[col].count()
+        estadisticos[nombre] = estadistico.reset_index()
+    return estadisticos
+
+
+def sumar_estadisticos_graficos(*estadisticos: dict) -> dict:
+    """Combina estadísticos de gráficos (p. ej. los guardados + los de un bloque nuevo)."""
+    combinados = {}
+    for nombre, (_, claves, _) in ESTADISTICOS.items():
+        partes = [e[nombre] for e in estadisticos if e.get(nombre) is not None]
+        if len(partes) < sum(nombre in e for e in estadisticos) or not partes:
+            combinados[nombre] = None
+            continue
+        df = pd.concat(partes, ignore_index=True)
+        df[claves] = df[claves].astype(object)
+        combinados[nombre] = df.groupby(claves, sort=True).sum().reset_index()
+    return combinados
+
+
+def guardar_estadisticos_graficos(estadisticos: dict):
+    """Guarda los estadísticos de los gráficos en CHART_STATS (escritura atómica)."""
+    payload = {
+        nombre: None if df is None else {col: _valores(df[col]) for col in df.columns}
+        for nombre, df in estadisticos.items()
+    }
+    with open(CHART_STATS + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, default=lambda v: v.item())
+    os.replace(CHART_STATS + ".tmp", CHART_STATS)
+
+
+def cargar_estadisticos_graficos() -> dict:
+    """Estadísticos guardados en CHART_STATS, o None si aún no existen."""
+    if not os.path.exists(CHART_STATS):
+        return None
+    with open(CHART_STATS, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    return {nombre: None if columnas is None else pd.DataFrame(columnas) for nombre, columnas in payload.items()}
+
+
+def datos_desde_estadisticos(estadisticos: dict, impacto: pd.DataFrame) -> dict:
+    """{nombre: datos a dibujar} a partir del índice por ciudad y los estadísticos."""
+    fuentes = {"impact_social": impacto, **estadisticos}
+    return {nombre: preparar(fuentes) for nombre, (preparar, _) in GRAFICOS.items()}
+
+
+def datos_graficos(tablas: dict = None) -> dict:
+    """{nombre: datos a dibujar} de todos los gráficos (None si el gráfico no aplica)."""
+    tablas = cargar_tablas() if tablas is None else tablas
+    return datos_desde_estadisticos(estadisticos_graficos(tablas), tablas["impact_social"])
+
+
+def actualizar_datos_graficos(bloque: dict, impacto: pd.DataFrame) -> dict:
+    """
+    Suma a los estadísticos guardados los de `bloque` ({tabla: filas nuevas},
+    ya agregadas a las tablas) y guarda las series de los gráficos con el
+    índice por ciudad `impacto`. Sin estadísticos guardados se calculan una
+    vez desde las tablas completas.
+    """
+    guardados = cargar_estadisticos_graficos()
+    if guardados is None:
+        estadisticos = estadisticos_graficos(cargar_tablas())
+    else:
+        estadisticos = sumar_estadisticos_graficos(guardados, estadisticos_graficos(bloque))
+    guardar_estadisticos_graficos(estadisticos)
+    return guardar_datos_graficos(datos_desde_estadisticos(estadisticos, impacto))
+
+
+def _valores(valores) -> list:
+    return [None if pd.isna(v) else v for v in pd.Series(valores, dtype=object).tolist()]
+
+
+def serie_json(nombre: str, datos) -> dict:
+    """
+    Datos de un gráfico como JSON: etiquetas (índice) y una lista de valores por
+    columna, con los nombres de ejes que usa el gráfico. `datos_desde_json`
+    hace el camino inverso.
+    """
+    es_serie = isinstance(datos, pd.Series)
+    df = datos.to_frame() if es_serie else datos
+    return {
+        "grafico": nombre,
+        "titulo": TITULOS[nombre],
+        "serie": es_serie,
+        "indice": {"nombre": df.index.name, "valores": _valores(df.index)},
+        "columnas": {"nombre": df.columns.name, "valores": {str(c): _valores(df[c]) for c in df.columns}},
+    }
+
+
+def datos_desde_json(payload: dict):
+    indice = pd.Index(payload["indice"]["valores"], name=payload["indice"]["nombre"])
+    df = pd.DataFrame(payload["columnas"]["valores"], index=indice)
+    df.columns.name = payload["columnas"]["nombre"]
+    return df.iloc[:, 0] if payload["serie"] else df
+
+
+def _series_json(datos: dict) -> dict:
+    return {nombre: serie_json(nombre, d) for nombre, d in datos.items() if d is not None}
+
+
+def guardar_datos_graficos(datos: dict = None):
+    """Guarda las series de todos los gráficos en CHART_DATA (escritura atómica)."""
+    payload = _series_json(datos_graficos() if datos is None else datos)
+    with open(CHART_DATA + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, default=lambda v: v.item())
+    os.replace(CHART_DATA + ".tmp", CHART_DATA)
+    return payload
+
+
+def cargar_datos_graficos() -> dict:
+    """
+    Series guardadas por el pipeline; si aún no existen se calculan en memoria
+    desde las tablas sin guardarlas (solo el pipeline y la ingesta escriben CHART_DATA).
+    """
+    if not os.path.exists(CHART_DATA):
+        return _series_json(datos_graficos())
+    with open(CHART_DATA, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def archivos_datos_graficos() -> list:
+    """Archivos de los que salen las series: CHART_DATA o, mientras no exista, las tablas."""
+    if os.path.exists(CHART_DATA):
+        return [CHART_DATA]
+    tablas = [os.path.join(DATA_DIR, nombre) for nombre in TABLAS]
+    return [CHART_DATA] + [f for t in tablas for f in archivos_tabla(t) + [ruta_csv(t)]]
+
+
+# ==============================
+#  MOTOR DE RENDERIZADO
+# ==============================
+def renderizar_grafico(nombre: str, formato: str = "png", ancho: int = None) -> bytes:
+    """Dibuja un gráfico en memoria a partir de sus series guardadas (CHART_DATA)."""
+    payload = cargar_datos_graficos().get(nombre)
+    if payload is None:
+        raise KeyError(f"Sin datos para el gráfico: {nombre}")
+    buffer = io.BytesIO()
+    GRAFICOS[nombre][1](datos_desde_json(payload), buffer, formato=formato, ancho=ancho)
+    return buffer.getvalue()
+
+
+
+def huella_grafico(nombre: str, datos) -> str:
+    """Hash de lo que se dibuja (valores, índice y columnas), no de las tablas completas."""
+    h = hashlib.sha256(nombre.encode())
+    h.update(pd.util.hash_pandas_object(datos, index=True).to_numpy().tobytes())
+    columnas = datos.columns if isinstance(datos, pd.DataFrame) else [datos.name]
+    h.update(repr((list(columnas), datos.index.names)).encode())
+    return h.hexdigest()
+
+
+def _leer_cache_graficos() -> dict:
+    if os.path.exists(CHART_CACHE):
+        with open(CHART_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _guardar_cache_graficos(cache: dict):
+    os.makedirs(os.path.dirname(CHART_CACHE), exist_ok=True)
+    with open(CHART_CACHE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(CHART_CACHE + ".tmp", CHART_CACHE)
+
+
+def _dibujar(nombre: str, datos, path: str):
+    """Se ejecuta en un proceso del pool (o en el actual): dibuja y devuelve su duración."""
+    inicio = time.perf_counter()
+    GRAFICOS[nombre][1](datos, path)
+    return nombre, time.perf_counter() - inicio
+
+
+def renderizar_graficos(pendientes: dict, workers: int = None) -> dict:
+    """
+    Dibuja {nombre: (datos, path)} en el proceso actual o, si se piden
+    `workers` (o CHART_WORKERS) > 1, repartiendo los gráficos entre procesos.
+    """
+    workers = min(workers or settings.CHART_WORKERS or 1, len(pendientes))
+    if workers <= 1:
+        return dict(_dibujar(nombre, datos, path) for nombre, (datos, path) in pendientes.items())
+
+    # Sin fork: el pipeline puede correr en un hilo de la API (ver `nlp_service.inferir_en_paralelo`)
+    if "forkserver" in mp.get_all_start_methods():
+        contexto = mp.get_context("forkserver")
+        contexto.set_forkserver_preload([__name__])
+    else:
+        contexto = mp.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=contexto) as pool:
+        futuros = [pool.submit(_dibujar, nombre, datos, path) for nombre, (datos, path) in pendientes.items()]
+        return dict(f.result() for f in futuros)
 
 
 # ==============================
 #  FUNCIÓN PRINCIPAL
 # ==============================
-def generar_todos_los_graficos(output_dir):
-    """Genera los 5 gráficos finales del dashboard."""
+def generar_todos_los_graficos(output_dir, forzar: bool = False, workers: int = None):
+    """
+    Genera los gráficos finales del dashboard y guarda sus series en
+    CHART_DATA. Las tablas se leen una vez y solo se dibujan los gráficos
+    cuyos datos cambiaron desde la última vez (o cuya imagen falta), salvo
+    con `forzar=True`.
+    """
     os.makedirs(output_dir, exist_ok=True)
     print(f"Generando visualizaciones en {output_dir} ...")
+    inicio = time.perf_counter()
 
-    rutas = {
-        "impacto_por_ciudad": grafico_impacto_por_ciudad(output_dir),
-        "categorias_impacto": grafico_categorias_impacto(output_dir),
-        "internet_vs_urgencia": grafico_internet_vs_urgencia(output_dir),
-        "reportes_por_genero": grafico_reportes_por_genero(output_dir),
-        "sentimiento_promedio": grafico_sentimiento_promedio(output_dir),
-        "temas_detectados": grafico_temas_detectados(output_dir),
-    }
+    with medir("datos_graficos"):
+        tablas = cargar_tablas()
+        estadisticos = estadisticos_graficos(tablas)
+        guardar_estadisticos_graficos(estadisticos)
+        todos = datos_desde_estadisticos(estadisticos, tablas["impact_social"])
+        guardar_datos_graficos(todos)
+    cache = _leer_cache_graficos()
+    previas = cache.get(os.path.abspath(output_dir), {})
+
+    rutas, huellas, pendientes = {}, {}, {}
+    for nombre, datos in todos.items():
+        if datos is None:
+            rutas[nombre] = None
+            continue
+        path = os.path.join(output_dir, f"{nombre}.png")
+        rutas[nombre] = path
+        huellas[nombre] = huella_grafico(nombre, datos)
+        if forzar or previas.get(nombre) != huellas[nombre] or not os.path.exists(path):
+            pendientes[nombre] = (datos, path)
 
+    with medir("render", graficos=len(pendientes)):
+        tiempos = renderizar_graficos(pendientes, workers) if pendientes else {}
+    cache[os.path.abspath(output_dir)] = huellas
+    _guardar_cache_graficos(cache)
 
-    print("✅ Gráficos generados correctamente.")
+    for nombre, segundos in tiempos.items():
+        print(f"   {nombre}: {segundos:.2f}s")
+    print(f"✅ Gráficos generados correctamente: {len(pendientes)} dibujados, "
+          f"{len(huellas) - len(pendientes)} sin cambios ({time.perf_counter() - inicio:.2f}s).")
     return rutas
 
 
@@ -15,4 +15,52 @@ class Settings:
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "changeme")
 
+    # ETL por bloques (0 = leer el archivo completo en memoria)
+    ETL_CHUNK_SIZE: int = int(os.getenv("ETL_CHUNK_SIZE", 0))
+
+    # Las tablas intermedias se guardan en Parquet; el CSV es una copia opcional
+    STORAGE_EXPORT_CSV: bool = os.getenv("STORAGE_EXPORT_CSV", "True") == "True"
+
+    # Lotes del modelo de sentimiento: máximo de tokens (filas x largo con padding) por lote
+    SENTIMENT_TOKEN_BUDGET: int = int(os.getenv("SENTIMENT_TOKEN_BUDGET", 8192))
+
+    # Backend de inferencia NLP en CPU: "torch", "int8" u "onnx"
+    NLP_BACKEND: str = os.getenv("NLP_BACKEND", "torch")
+    # Concordancia mínima de etiquetas de sentimiento del backend frente a PyTorch
+    NLP_PARITY_MIN: float = float(os.getenv("NLP_PARITY_MIN", 0.98))
+
+    # Procesos para embeddings y sentimiento (1 = un solo proceso)
+    NLP_WORKERS: int = int(os.getenv("NLP_WORKERS", 1))
+
+    # Agrupación de temas: "kmeans" (en memoria) o "minibatch" (por bloques, admite partial_fit)
+    TOPIC_CLUSTERING: str = os.getenv("TOPIC_CLUSTERING", "kmeans")
+    TOPIC_CHUNK_SIZE: int = int(os.getenv("TOPIC_CHUNK_SIZE", 10_000))
+
+    # Barrido de K: muestra para Silhouette, muestra para ajustar cada K y procesos (-1 = todos)
+    K_SWEEP_SAMPLE: int = int(os.getenv("K_SWEEP_SAMPLE", 5_000))
+    K_SWEEP_FIT_SAMPLE: int = int(os.getenv("K_SWEEP_FIT_SAMPLE", 20_000))
+    K_SWEEP_JOBS: int = int(os.getenv("K_SWEEP_JOBS", -1))
+
+    # Procesos para dibujar los gráficos del dashboard (0 o 1 = en el proceso actual: para
+    # seis gráficos pequeños arrancar procesos e importar matplotlib cuesta más que dibujarlos)
+    CHART_WORKERS: int = int(os.getenv("CHART_WORKERS", 0))
+
+    # Caché de respuestas de la API analítica (entradas LRU; 0 = desactivada)
+    API_CACHE_SIZE: int = int(os.getenv("API_CACHE_SIZE", 64))
+
+    # Imágenes de gráficos bajo demanda: entradas en la caché LRU y anchos permitidos (px)
+    IMAGE_CACHE_SIZE: int = int(os.getenv("IMAGE_CACHE_SIZE", 128))
+    IMAGE_MIN_WIDTH: int = int(os.getenv("IMAGE_MIN_WIDTH", 200))
+    IMAGE_MAX_WIDTH: int = int(os.getenv("IMAGE_MAX_WIDTH", 2400))
+
+    # Mediciones por etapa (tiempo, CPU, memoria, filas) en data/metrics
+    INSTRUMENTATION: bool = os.getenv("INSTRUMENTATION", "True") == "True"
+    # Aviso de regresión: un paso que tarda más de FACTOR veces su mediana en las últimas N corridas
+    METRICS_HISTORY_RUNS: int = int(os.getenv("METRICS_HISTORY_RUNS", 10))
+    METRICS_REGRESSION_FACTOR: float = float(os.getenv("METRICS_REGRESSION_FACTOR", 1.5))
+    # Tamaño máximo (MB) de pasos.jsonl e historial.jsonl antes de rotarlos (se conserva un .1)
+    METRICS_LOG_MAX_MB: float = float(os.getenv("METRICS_LOG_MAX_MB", 20))
+    # Intervalo (ms) de muestreo de la memoria residente mientras se mide un paso (0 = sin muestreo)
+    METRICS_RSS_SAMPLE_MS: int = int(os.getenv("METRICS_RSS_SAMPLE_MS", 50))
+
 settings = Settings()
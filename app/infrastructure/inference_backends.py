@@ -0,0 +1,105 @@
+import os
+import re
+import warnings
+from types import SimpleNamespace
+
+import torch
+
+# ==============================
+#  BACKENDS DE INFERENCIA (CPU)
+# ==============================
+# - "torch": PyTorch float32 (referencia).
+# - "int8":  cuantización dinámica int8 de las capas lineales (solo PyTorch).
+# - "onnx":  ONNX Runtime; requiere `onnxruntime` (y `optimum` para embeddings).
+BACKENDS = ("torch", "int8", "onnx")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ONNX_DIR = os.path.join(BASE_DIR, "data", "models", "onnx")
+
+
+def validar_backend(backend: str) -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferencia desconocido: '{backend}'. Opciones: {', '.join(BACKENDS)}")
+    return backend
+
+
+def _cuantizar_int8(modelo):
+    from torch.ao.quantization import quantize_dynamic
+
+    with warnings.catch_warnings():
+        # La API eager de cuantización está marcada como obsoleta, pero sigue siendo la vía sin dependencias extra
+        warnings.simplefilter("ignore")
+        return quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# ==============================
+#  CLASIFICADOR DE SENTIMIENTO
+# ==============================
+class ClasificadorONNX:
+    """Sesión de ONNX Runtime con la misma interfaz que el modelo torch: `model(**inputs).logits`."""
+
+    def __init__(self, ruta: str):
+        import onnxruntime as ort
+
+        opciones = ort.SessionOptions()
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.sesion = ort.InferenceSession(ruta, opciones, providers=["CPUExecutionProvider"])
+        self.entradas = [i.name for i in self.sesion.get_inputs()]
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        feed = {k: inputs[k].cpu().numpy() for k in self.entradas}
+        logits = self.sesion.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+def _exportar_onnx(nombre: str, tokenizer, modelo) -> str:
+    """Exporta el clasificador a ONNX (una vez) y devuelve la ruta del archivo."""
+    ruta = os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9._-]+", "_", nombre) + ".onnx")
+    if os.path.exists(ruta):
+        return ruta
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    ejemplo = tokenizer(["texto de ejemplo"], return_tensors="pt")
+    nombres = list(ejemplo.keys())
+    ejes = {k: {0: "lote", 1: "tokens"} for k in nombres}
+    ejes["logits"] = {0: "lote"}
+    torch.onnx.export(
+        modelo, tuple(ejemplo[k] for k in nombres), ruta + ".tmp",
+        input_names=nombres, output_names=["logits"], dynamic_axes=ejes,
+        opset_version=17, dynamo=False,
+    )
+    os.replace(ruta + ".tmp", ruta)
+    return ruta
+
+
+def cargar_clasificador(nombre: str, backend: str = "torch"):
+    """Devuelve (tokenizer, modelo) del clasificador `nombre` con el backend pedido."""
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    validar_backend(backend)
+    tokenizer = AutoTokenizer.from_pretrained(nombre)
+    modelo = AutoModelForSequenceClassification.from_pretrained(nombre)
+    modelo.eval()
+    if backend == "int8":
+        modelo = _cuantizar_int8(modelo)
+    elif backend == "onnx":
+        # Salida como tupla para que el exportador no dependa de ModelOutput
+        modelo.config.return_dict = False
+        modelo = ClasificadorONNX(_exportar_onnx(nombre, tokenizer, modelo))
+    return tokenizer, modelo
+
+
+# ==============================
+#  CODIFICADOR DE EMBEDDINGS
+# ==============================
+def cargar_codificador(nombre: str, backend: str = "torch"):
+    """Devuelve un SentenceTransformer de `nombre` con el backend pedido."""
+    from sentence_transformers import SentenceTransformer
+
+    validar_backend(backend)
+    if backend == "onnx":
+        return SentenceTransformer(nombre, backend="onnx")
+    modelo = SentenceTransformer(nombre)
+    return _cuantizar_int8(modelo) if backend == "int8" else modelo
@@ -0,0 +1,320 @@
+import json
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.core.config import settings
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+METRICS_DIR = os.path.join(BASE_DIR, "data", "metrics")
+# Una línea JSON por medición y una por corrida completa del pipeline
+PASOS_LOG = os.path.join(METRICS_DIR, "pasos.jsonl")
+HISTORIAL_LOG = os.path.join(METRICS_DIR, "historial.jsonl")
+
+# ==============================
+#  MEDICIONES POR ETAPA Y PASO
+# ==============================
+# `medir` anota tiempo de reloj, tiempo de CPU, pico de memoria residente
+# durante el paso y filas. CPU y memoria son del proceso completo (todos sus
+# hilos, incluidos los de torch/BLAS y los de otras peticiones de la API, más
+# los procesos hijos ya esperados). Los pasos anidados se nombran con su ruta
+# ("pipeline/nlp/embeddings"). Solo usa `getrusage`, `perf_counter` y /proc,
+# así que puede quedar activo en producción.
+_local = threading.local()
+_lock = threading.Lock()
+_ultimos = {}
+_acumulados = {}
+# Escritura (y rotación) de los registros en data/metrics
+_lock_archivos = threading.Lock()
+# Pasos en curso en cualquier hilo y el hilo que muestrea su memoria residente
+_activos = []
+_muestreador = None
+
+
+def memoria_proceso_mb() -> float:
+    """Memoria residente actual del proceso (MB). Usa el pico si no hay /proc."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return _pico_rss_mb()
+
+
+def _pico_rss_mb() -> float:
+    """Pico de memoria residente de toda la vida del proceso (MB)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en bytes en macOS y en KB en Linux
+    return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024
+
+
+def _muestrear_memoria():
+    """Mientras haya pasos en curso, anota en cada uno el mayor RSS observado."""
+    global _muestreador
+    intervalo = settings.METRICS_RSS_SAMPLE_MS / 1000
+    while True:
+        time.sleep(intervalo)
+        with _lock:
+            if not _activos:
+                _muestreador = None
+                return
+            rss = memoria_proceso_mb()
+            for activo in _activos:
+                activo["_pico"] = max(activo["_pico"], rss)
+
+
+def _iniciar_pico(registro: dict):
+    """Empieza a medir el pico del paso (el contador del kernel no se toca)."""
+    global _muestreador
+    with _lock:
+        registro["_rss_inicio"] = memoria_proceso_mb()
+        registro["_pico"] = registro["_rss_inicio"]
+        registro["_pico_vida"] = _pico_rss_mb()
+        _activos.append(registro)
+        if _muestreador is None and settings.METRICS_RSS_SAMPLE_MS > 0:
+            _muestreador = threading.Thread(target=_muestrear_memoria, name="muestreo-rss", daemon=True)
+            _muestreador.start()
+
+
+def _terminar_pico(registro: dict, rss_fin: float) -> float:
+    """
+    Pico de RSS durante el paso (MB): el mayor valor muestreado o, si el pico
+    de vida del proceso subió mientras tanto, ese pico (que es exacto).
+    """
+    with _lock:
+        _activos.remove(registro)
+        pico = max(registro.pop("_pico"), rss_fin)
+        pico_vida = _pico_rss_mb()
+        return max(pico, pico_vida) if pico_vida > registro["_pico_vida"] else pico
+
+
+def _cpu_segundos() -> float:
+    propio = resource.getrusage(resource.RUSAGE_SELF)
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return propio.ru_utime + propio.ru_stime + hijos.ru_utime + hijos.ru_stime
+
+
+def _pila() -> list:
+    if not hasattr(_local, "pila"):
+        _local.pila = []
+    return _local.pila
+
+
+def _escribir_linea(path: str, registro: dict):
+    """Agrega `registro` a `path`; pasado METRICS_LOG_MAX_MB el archivo se rota a `path`.1."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock_archivos:
+        if os.path.exists(path) and os.path.getsize(path) >= settings.METRICS_LOG_MAX_MB * 1024 ** 2:
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+
+def _ultimas_lineas(path: str, n: int, bloque: int = 64 * 1024) -> list:
+    """Últimas `n` líneas no vacías de `path`, leyendo el archivo desde el final."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        fin = f.seek(0, os.SEEK_END)
+        datos = b""
+        while fin > 0 and datos.count(b"\n") <= n:
+            inicio = max(0, fin - bloque)
+            f.seek(inicio)
+            datos = f.read(fin - inicio) + datos
+            fin = inicio
+    lineas = datos.decode("utf-8", errors="replace").splitlines()
+    if fin > 0:
+        lineas = lineas[1:]  # la primera puede estar cortada
+    lineas = [linea for linea in lineas if linea.strip()]
+    return lineas[-n:] if n > 0 else []
+
+
+@contextmanager
+def medir(nombre: str, **extra):
+    """
+    Mide el bloque como paso `nombre` (anidado bajo el paso activo del hilo).
+    Devuelve un dict donde el bloque puede anotar `filas` u otros datos.
+    """
+    if not settings.INSTRUMENTATION:
+        yield dict(extra)
+        return
+
+    pila = _pila()
+    ruta = f"{pila[-1]['paso']}/{nombre}" if pila else nombre
+    registro = {"paso": ruta, "corrida": getattr(_local, "corrida", None), **extra}
+    pila.append(registro)
+    _iniciar_pico(registro)
+    inicio, cpu_inicio = time.perf_counter(), _cpu_segundos()
+    registro["inicio"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    try:
+        yield registro
+        registro["estado"] = "ok"
+    except BaseException:
+        registro["estado"] = "error"
+        raise
+    finally:
+        pila.pop()
+        registro["segundos"] = round(time.perf_counter() - inicio, 4)
+        registro["cpu_segundos"] = round(_cpu_segundos() - cpu_inicio, 4)
+        rss_fin = memoria_proceso_mb()
+        pico = _terminar_pico(registro, rss_fin)
+        rss_inicio = registro.pop("_rss_inicio")
+        del registro["_pico_vida"]
+        registro["pico_rss_mb"] = round(pico, 1)
+        # Memoria que el paso llegó a sumar sobre la que había al empezar
+        registro["pico_delta_mb"] = round(pico - rss_inicio, 1)
+        registro["rss_mb"] = round(rss_fin, 1)
+        _registrar(registro)
+
+
+def anotar(**datos):
+    """Agrega datos (p. ej. `filas`) al paso que se está midiendo en este hilo."""
+    pila = _pila()
+    if pila:
+        pila[-1].update(datos)
+
+
+def _registrar(registro: dict):
+    with _lock:
+        _ultimos[registro["paso"]] = registro
+        total = _acumulados.setdefault(registro["paso"], {"ejecuciones": 0, "segundos": 0.0, "errores": 0})
+        total["ejecuciones"] += 1
+        total["segundos"] += registro["segundos"]
+        total["errores"] += registro["estado"] == "error"
+        corrida = getattr(_local, "pasos_corrida", None)
+        if corrida is not None:
+            corrida.append(registro)
+    try:
+        _escribir_linea(PASOS_LOG, registro)
+    except OSError as e:
+        print(f"No se pudo escribir la medición de '{registro['paso']}': {e}")
+
+
+# ==============================
+#  CORRIDAS E HISTORIAL
+# ==============================
+@contextmanager
+def corrida(nombre: str = "pipeline", **extra):
+    """
+    Agrupa las mediciones de una corrida completa bajo el paso `nombre`; al
+    terminar guarda su resumen en el historial y avisa de los pasos que
+    tardaron bastante más que en corridas anteriores.
+    """
+    if not settings.INSTRUMENTATION:
+        yield None
+        return
+
+    _local.corrida = uuid.uuid4().hex[:12]
+    _local.pasos_corrida = []
+    try:
+        with medir(nombre, **extra) as registro:
+            yield registro
+    finally:
+        resumen = {
+            "corrida": _local.corrida,
+            "inicio": registro["inicio"],
+            "estado": registro.get("estado"),
+            "pasos": {
+                r["paso"]: {
+                    k: r.get(k) for k in ("segundos", "cpu_segundos", "pico_rss_mb", "pico_delta_mb", "filas")
+                }
+                for r in _local.pasos_corrida
+            },
+        }
+        _local.corrida = None
+        _local.pasos_corrida = None
+        regresiones = comparar_con_historial(resumen)
+        for r in regresiones:
+            print(f"⚠️ '{r['paso']}' tardó {r['segundos']:.2f}s (mediana previa {r['mediana_previa']:.2f}s)")
+        resumen["regresiones"] = regresiones
+        try:
+            _escribir_linea(HISTORIAL_LOG, resumen)
+        except OSError as e:
+            print(f"No se pudo guardar el historial de la corrida: {e}")
+
+
+def historial(n: int = 20) -> list:
+    """
+    Resúmenes de las últimas `n` corridas (la más reciente al final). Solo se
+    lee el final del archivo (y del rotado si no alcanza).
+    """
+    lineas = _ultimas_lineas(HISTORIAL_LOG, n)
+    if len(lineas) < n:
+        lineas = _ultimas_lineas(HISTORIAL_LOG + ".1", n - len(lineas)) + lineas
+    return [json.loads(linea) for linea in lineas]
+
+
+def comparar_con_historial(resumen: dict, n: int = None, factor: float = None, minimo: float = 0.5) -> list:
+    """
+    Pasos de `resumen` cuya duración supera `factor` veces la mediana de las
+    últimas `n` corridas que también lo ejecutaron. Se ignoran los pasos que
+    duran menos de `minimo` segundos.
+    """
+    n = n or settings.METRICS_HISTORY_RUNS
+    factor = factor or settings.METRICS_REGRESSION_FACTOR
+    previas = historial(n)
+    regresiones = []
+    for paso, datos in resumen["pasos"].items():
+        segundos = datos.get("segundos") or 0.0
+        valores = [c["pasos"][paso]["segundos"] for c in previas if paso in c.get("pasos", {})]
+        if not valores or segundos < minimo:
+            continue
+        mediana = statistics.median(valores)
+        if segundos > factor * mediana:
+            regresiones.append({"paso": paso, "segundos": segundos, "mediana_previa": mediana})
+    return regresiones
+
+
+# ==============================
+#  EXPOSICIÓN
+# ==============================
+def ultimas_mediciones() -> dict:
+    with _lock:
+        return {paso: dict(r) for paso, r in _ultimos.items()}
+
+
+def _etiqueta(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def metricas_prometheus(prefijo: str = "civia") -> str:
+    """Mediciones en formato de texto de Prometheus (última ejecución y acumulados por paso)."""
+    with _lock:
+        ultimos = {paso: dict(r) for paso, r in _ultimos.items()}
+        acumulados = {paso: dict(t) for paso, t in _acumulados.items()}
+
+    series = [
+        ("paso_segundos", "gauge", "Tiempo de reloj de la última ejecución del paso", "segundos"),
+        ("paso_cpu_segundos", "gauge", "Tiempo de CPU (proceso e hijos) de la última ejecución", "cpu_segundos"),
+        ("paso_pico_rss_mb", "gauge", "Pico de memoria residente durante la última ejecución del paso", "pico_rss_mb"),
+        ("paso_pico_delta_mb", "gauge", "Pico de memoria del paso menos la residente al empezar", "pico_delta_mb"),
+        ("paso_filas", "gauge", "Filas procesadas en la última ejecución del paso", "filas"),
+    ]
+    lineas = []
+    for nombre, tipo, ayuda, campo in series:
+        lineas += [f"# HELP {prefijo}_{nombre} {ayuda}", f"# TYPE {prefijo}_{nombre} {tipo}"]
+        for paso, r in sorted(ultimos.items()):
+            if r.get(campo) is not None:
+                lineas.append(f'{prefijo}_{nombre}{{paso="{_etiqueta(paso)}"}} {r[campo]}')
+
+    contadores = [
+        ("paso_ejecuciones_total", "Ejecuciones del paso desde que arrancó el proceso", "ejecuciones"),
+        ("paso_segundos_total", "Tiempo de reloj acumulado del paso", "segundos"),
+        ("paso_errores_total", "Ejecuciones del paso que terminaron con error", "errores"),
+    ]
+    for nombre, ayuda, campo in contadores:
+        lineas += [f"# HELP {prefijo}_{nombre} {ayuda}", f"# TYPE {prefijo}_{nombre} counter"]
+        for paso, t in sorted(acumulados.items()):
+            lineas.append(f'{prefijo}_{nombre}{{paso="{_etiqueta(paso)}"}} {round(t[campo], 4)}')
+
+    lineas += [
+        f"# HELP {prefijo}_proceso_rss_mb Memoria residente actual del proceso",
+        f"# TYPE {prefijo}_proceso_rss_mb gauge",
+        f"{prefijo}_proceso_rss_mb {round(memoria_proceso_mb(), 1)}",
+    ]
+    return "\n".join(lineas) + "\n"
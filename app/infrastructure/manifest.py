@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MANIFEST_PATH = os.path.join(BASE_DIR, "data", "pipeline_manifest.json")
+
+
+# ==============================
+#  LECTURA / ESCRITURA DEL MANIFIESTO
+# ==============================
+def cargar_manifiesto(path: str = MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"archivos": {}, "etapas": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    manifiesto.setdefault("archivos", {})
+    manifiesto.setdefault("etapas", {})
+    return manifiesto
+
+
+def guardar_manifiesto(manifiesto: dict, path: str = MANIFEST_PATH):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _clave(path: str) -> str:
+    return os.path.relpath(os.path.abspath(path), BASE_DIR)
+
+
+# ==============================
+#  HUELLAS
+# ==============================
+def huella_archivo(path: str, manifiesto: dict) -> str:
+    """
+    SHA-256 del contenido de un archivo. Se reutiliza el hash guardado
+    mientras el tamaño y la fecha de modificación no cambien, así que un
+    archivo intacto no se vuelve a leer.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    clave = _clave(path)
+    previo = manifiesto["archivos"].get(clave)
+    if previo and previo["size"] == stat.st_size and previo["mtime_ns"] == stat.st_mtime_ns:
+        return previo["sha256"]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloque)
+    manifiesto["archivos"][clave] = {
+        "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha.hexdigest()
+    }
+    return sha.hexdigest()
+
+
+def huella_etapa(manifiesto: dict, archivos=(), parametros: dict = None) -> str:
+    """Huella de una etapa: hash de sus archivos de entrada y de sus parámetros."""
+    contenido = {
+        "archivos": {_clave(p): huella_archivo(p, manifiesto) for p in archivos},
+        "parametros": parametros or {},
+    }
+    serializado = json.dumps(contenido, sort_keys=True, default=str)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+# ==============================
+#  ESTADO DE LAS ETAPAS
+# ==============================
+def etapa_vigente(manifiesto: dict, nombre: str, huella: str, salidas=()) -> bool:
+    """Una etapa está vigente si su huella no cambió y sus salidas siguen existiendo."""
+    previa = manifiesto["etapas"].get(nombre)
+    return (
+        previa is not None
+        and previa["huella"] == huella
+        and all(os.path.exists(p) for p in salidas)
+    )
+
+
+def registrar_etapa(manifiesto: dict, nombre: str, huella: str, salidas=()):
+    manifiesto["etapas"][nombre] = {"huella": huella, "salidas": [_clave(p) for p in salidas]}
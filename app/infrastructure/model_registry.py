@@ -0,0 +1,69 @@
+import threading
+import time
+
+from app.infrastructure.instrumentation import medir, memoria_proceso_mb
+
+# ==============================
+#  REGISTRO DE MODELOS
+# ==============================
+# Cada modelo se carga una sola vez por proceso (la primera vez que se pide)
+# y queda en memoria para las siguientes corridas del pipeline y la API.
+_modelos = {}
+_estado = {}
+_lock = threading.Lock()
+_locks_carga = {}
+
+
+def _bytes_parametros(modelo) -> int:
+    """Tamaño de los pesos de un modelo torch (o de una tupla que lo contenga)."""
+    partes = modelo if isinstance(modelo, (tuple, list)) else (modelo,)
+    total = 0
+    for parte in partes:
+        if hasattr(parte, "parameters"):
+            total += sum(p.numel() * p.element_size() for p in parte.parameters())
+    return total
+
+
+def obtener_modelo(nombre: str, cargador):
+    """
+    Devuelve el modelo registrado como `nombre`; si aún no está en memoria lo
+    crea con `cargador()` y registra el tiempo de carga y la memoria usada.
+    Las cargas concurrentes del mismo modelo esperan a la primera.
+    """
+    if nombre in _modelos:
+        return _modelos[nombre]
+    with _lock:
+        lock = _locks_carga.setdefault(nombre, threading.Lock())
+    with lock:
+        if nombre in _modelos:
+            return _modelos[nombre]
+        print(f"Cargando modelo '{nombre}'...")
+        memoria_previa = memoria_proceso_mb()
+        inicio = time.perf_counter()
+        with medir(f"carga_modelo[{nombre}]"):
+            modelo = cargador()
+        segundos = time.perf_counter() - inicio
+        _estado[nombre] = {
+            "segundos_carga": round(segundos, 3),
+            "memoria_mb": round(max(memoria_proceso_mb() - memoria_previa, 0.0), 1),
+            "pesos_mb": round(_bytes_parametros(modelo) / 1024 ** 2, 1),
+            "cargado_en": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        _modelos[nombre] = modelo
+        print(f"✅ Modelo '{nombre}' cargado en {segundos:.1f}s")
+        return modelo
+
+
+def estado_modelos() -> dict:
+    """Modelos en memoria con su tiempo de carga y memoria, más la memoria del proceso."""
+    return {
+        "modelos": {nombre: dict(info) for nombre, info in _estado.items()},
+        "memoria_proceso_mb": round(memoria_proceso_mb(), 1),
+    }
+
+
+def liberar_modelos():
+    """Descarta los modelos en memoria (se recargarán al pedirlos de nuevo)."""
+    with _lock:
+        _modelos.clear()
+        _estado.clear()
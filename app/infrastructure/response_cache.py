@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# ==============================
+#  CACHÉ DE RESPUESTAS DE LA API
+# ==============================
+# Guarda el cuerpo JSON ya serializado de cada endpoint junto con la firma de
+# los archivos de datos de los que se calculó. Si algún archivo cambia (mtime o
+# tamaño) la entrada deja de ser válida y se recalcula en la siguiente petición.
+
+
+def firma_archivos(rutas: list) -> tuple:
+    """(ruta, mtime_ns, tamaño) de cada archivo; los que no existen se marcan con None."""
+    firma = []
+    for ruta in rutas:
+        try:
+            info = os.stat(ruta)
+            firma.append((ruta, info.st_mtime_ns, info.st_size))
+        except OSError:
+            firma.append((ruta, None, None))
+    return tuple(firma)
+
+
+def calcular_etag(cuerpo: bytes) -> str:
+    return '"' + hashlib.blake2b(cuerpo, digest_size=16).hexdigest() + '"'
+
+
+class CacheRespuestas:
+    """LRU de respuestas por clave, validadas contra la firma de sus archivos de datos."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"aciertos": 0, "fallos": 0, "invalidaciones": 0, "desalojos": 0, "no_modificado": 0}
+
+    def obtener(self, clave: str, firma: tuple):
+        """Devuelve (cuerpo, etag) si la entrada existe y sus archivos no cambiaron."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] != firma:
+                del self._entradas[clave]
+                self._stats["invalidaciones"] += 1
+                entrada = None
+            if entrada is None:
+                self._stats["fallos"] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._stats["aciertos"] += 1
+            return entrada[1], entrada[2]
+
+    def guardar(self, clave: str, firma: tuple, cuerpo: bytes) -> str:
+        etag = calcular_etag(cuerpo)
+        if self.max_entradas <= 0:
+            return etag
+        with self._lock:
+            self._entradas[clave] = (firma, cuerpo, etag)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._stats["desalojos"] += 1
+        return etag
+
+    def registrar_no_modificado(self):
+        with self._lock:
+            self._stats["no_modificado"] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self._stats["aciertos"] + self._stats["fallos"]
+            return {
+                **self._stats,
+                "tasa_aciertos": round(self._stats["aciertos"] / consultas, 3) if consultas else 0.0,
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "bytes": sum(len(e[1]) for e in self._entradas.values()),
+                "claves": list(self._entradas),
+            }
@@ -0,0 +1,242 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.core.config import settings
+
+# Valores que `pd.read_csv` interpreta como vacío por defecto. Al guardar en
+# Parquet se convierten a nulos para que leer el Parquet o el CSV exportado
+# devuelva los mismos datos.
+CSV_NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+
+# ==============================
+#  RUTAS
+# ==============================
+def _base(ruta: str) -> str:
+    """Acepta 'data/x', 'data/x.csv' o 'data/x.parquet' y devuelve 'data/x'."""
+    base, ext = os.path.splitext(ruta)
+    return base if ext in (".csv", ".parquet") else ruta
+
+
+def ruta_parquet(ruta: str) -> str:
+    return _base(ruta) + ".parquet"
+
+
+def ruta_csv(ruta: str) -> str:
+    return _base(ruta) + ".csv"
+
+
+def existe_tabla(ruta: str) -> bool:
+    return os.path.exists(ruta_parquet(ruta)) or os.path.exists(ruta_csv(ruta))
+
+
+def ruta_deltas(ruta: str) -> str:
+    """Carpeta con los bloques agregados con `agregar_tabla` desde la última escritura completa."""
+    return _base(ruta) + ".deltas"
+
+
+def archivos_tabla(ruta: str) -> list:
+    """Archivos Parquet que forman la tabla: el principal y sus bloques agregados."""
+    archivos = [ruta_parquet(ruta)]
+    carpeta = ruta_deltas(ruta)
+    if os.path.isdir(carpeta):
+        archivos += [os.path.join(carpeta, f) for f in sorted(os.listdir(carpeta)) if f.endswith(".parquet")]
+    return archivos
+
+
+def esquema_tabla(ruta: str) -> pa.Schema:
+    """Esquema Parquet de la tabla, o None si aún no existe."""
+    path = ruta_parquet(ruta)
+    return pq.read_schema(path) if os.path.exists(path) else None
+
+
+def columnas_texto(ruta: str) -> list:
+    """Columnas de texto (string o diccionario) según el esquema Parquet de la tabla."""
+    esquema = esquema_tabla(ruta)
+    if esquema is None:
+        return []
+    return [f.name for f in esquema
+            if pa.types.is_string(f.type) or pa.types.is_large_string(f.type) or pa.types.is_dictionary(f.type)]
+
+
+# ==============================
+#  ESCRITURA
+# ==============================
+def _como_lectura_csv(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte a nulo los textos que `read_csv` leería como vacío."""
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].where(~df[col].isin(CSV_NA_VALUES)).cat.remove_unused_categories()
+        elif df[col].dtype == "object":
+            df[col] = df[col].where(~df[col].isin(CSV_NA_VALUES), None)
+    return df
+
+
+def _esquema_bloques(esquema: pa.Schema) -> pa.Schema:
+    """
+    Esquema de la tabla principal para sus bloques agregados: mismos tipos
+    (las columnas `category` siguen siendo diccionario), con índices de 32 bits
+    para que un bloque con más valores distintos que la tabla también quepa.
+    """
+    campos = [
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type, f.type.ordered))
+        if pa.types.is_dictionary(f.type) else f
+        for f in esquema
+    ]
+    return pa.schema(campos, metadata=esquema.metadata)
+
+
+def _a_arrow(df: pd.DataFrame, schema: pa.Schema = None) -> pa.Table:
+    tabla = pa.Table.from_pandas(_como_lectura_csv(df), schema=schema, preserve_index=False)
+    if schema is None:
+        # Una columna de texto sin valores en el primer bloque se tipa como texto
+        campos = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in tabla.schema]
+        tabla = tabla.cast(pa.schema(campos, metadata=tabla.schema.metadata))
+    return tabla
+
+
+def guardar_tabla(df: pd.DataFrame, ruta: str, exportar_csv: bool = None):
+    """
+    Guarda `df` en Parquet (formato canónico del pipeline) y, opcionalmente,
+    una copia CSV con separador ';'. Ambas escrituras son atómicas.
+    """
+    if exportar_csv is None:
+        exportar_csv = settings.STORAGE_EXPORT_CSV
+
+    destino = ruta_parquet(ruta)
+    pq.write_table(_a_arrow(df), destino + ".tmp")
+    os.replace(destino + ".tmp", destino)
+    # Una escritura completa reemplaza también los bloques agregados
+    shutil.rmtree(ruta_deltas(ruta), ignore_errors=True)
+
+    if exportar_csv:
+        destino = ruta_csv(ruta)
+        df.to_csv(destino + ".tmp", sep=";", encoding="utf-8", index=False)
+        os.replace(destino + ".tmp", destino)
+
+
+def agregar_tabla(df: pd.DataFrame, ruta: str, exportar_csv: bool = None):
+    """
+    Agrega filas a una tabla existente sin reescribirla: las filas nuevas se
+    guardan como un bloque Parquet aparte (que `leer_tabla` concatena) y se
+    añaden al final del CSV exportado. Si la tabla solo existe como CSV, este
+    se convierte antes a Parquet.
+    """
+    esquema = esquema_tabla(ruta)
+    if esquema is None and os.path.exists(ruta_csv(ruta)):
+        # Solo existe el CSV exportado (p. ej. en un clon recién hecho): se convierte
+        # en la tabla base para agregarle el bloque en lugar de reemplazarla
+        guardar_tabla(leer_tabla(ruta), ruta, exportar_csv=False)
+        esquema = esquema_tabla(ruta)
+    if esquema is None:
+        return guardar_tabla(df, ruta, exportar_csv)
+    if exportar_csv is None:
+        exportar_csv = settings.STORAGE_EXPORT_CSV
+
+    # Mismas columnas, en el mismo orden y con los mismos tipos que la tabla principal
+    df = df.reindex(columns=esquema.names)
+
+    carpeta = ruta_deltas(ruta)
+    os.makedirs(carpeta, exist_ok=True)
+    destino = os.path.join(carpeta, f"{len(archivos_tabla(ruta)):06d}.parquet")
+    pq.write_table(_a_arrow(df, _esquema_bloques(esquema)), destino + ".tmp")
+    os.replace(destino + ".tmp", destino)
+
+    if exportar_csv and os.path.exists(ruta_csv(ruta)):
+        df.to_csv(ruta_csv(ruta), sep=";", encoding="utf-8", index=False, header=False, mode="a")
+
+
+class EscritorTabla:
+    """
+    Escritura incremental por bloques (Parquet + CSV opcional). El esquema se
+    fija con el primer bloque; al cerrar, los archivos reemplazan a los previos.
+    Si no se escribió ningún bloque, se guarda una tabla vacía con `columnas`.
+    """
+
+    def __init__(self, ruta: str, exportar_csv: bool = None, columnas=None):
+        self.ruta = ruta
+        self.exportar_csv = settings.STORAGE_EXPORT_CSV if exportar_csv is None else exportar_csv
+        self.columnas = list(columnas or [])
+        self._parquet = None
+        self._csv = None
+        self.filas = 0
+
+    def escribir(self, df: pd.DataFrame):
+        if self._parquet is None:
+            tabla = _a_arrow(df)
+            self._parquet = pq.ParquetWriter(ruta_parquet(self.ruta) + ".tmp", tabla.schema)
+        else:
+            tabla = _a_arrow(df, self._parquet.schema)
+        self._parquet.write_table(tabla)
+
+        if self.exportar_csv:
+            primera = self._csv is None
+            if primera:
+                self._csv = open(ruta_csv(self.ruta) + ".tmp", "w", encoding="utf-8", newline="")
+            df.to_csv(self._csv, sep=";", index=False, header=primera)
+        self.filas += len(df)
+
+    def cerrar(self):
+        if self._parquet is None:
+            self.escribir(pd.DataFrame(columns=self.columnas))
+        if self._parquet is not None:
+            self._parquet.close()
+            os.replace(ruta_parquet(self.ruta) + ".tmp", ruta_parquet(self.ruta))
+            shutil.rmtree(ruta_deltas(self.ruta), ignore_errors=True)
+        if self._csv is not None:
+            self._csv.close()
+            os.replace(ruta_csv(self.ruta) + ".tmp", ruta_csv(self.ruta))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.cerrar()
+        else:
+            # Ante un error se descartan los temporales y se conservan los archivos previos
+            for handle in (self._parquet, self._csv):
+                if handle is not None:
+                    handle.close()
+            for tmp in (ruta_parquet(self.ruta) + ".tmp", ruta_csv(self.ruta) + ".tmp"):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+
+# ==============================
+#  LECTURA
+# ==============================
+def leer_tabla(ruta: str, columns=None, filtros: dict = None) -> pd.DataFrame:
+    """
+    Lee una tabla del pipeline. Usa el Parquet (memory-mapped, junto con sus
+    bloques agregados) si existe y, si no, el CSV con separador ';'.
+    Con `columns` solo se leen esas columnas; las que no existan en la tabla
+    se ignoran. `filtros` ({columna: valores}) devuelve solo las filas cuyo
+    valor está en la lista.
+    """
+    if os.path.exists(ruta_parquet(ruta)):
+        if columns is not None:
+            disponibles = set(pq.read_schema(ruta_parquet(ruta)).names)
+            columns = [c for c in columns if c in disponibles]
+        filters = [(col, "in", list(valores)) for col, valores in filtros.items()] if filtros else None
+        partes = [pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+                  for path in archivos_tabla(ruta)]
+        # Se concatena en Arrow: las columnas `category` de los bloques se unifican
+        # en una sola (con `pd.concat` quedarían como texto si sus categorías difieren)
+        tabla = partes[0] if len(partes) == 1 else pa.concat_tables(partes, promote_options="permissive")
+        return tabla.to_pandas()
+
+    path = ruta_csv(ruta)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No se encontró la tabla: {os.path.abspath(_base(ruta))}(.parquet|.csv)")
+    usecols = None if columns is None else (lambda c: c in columns)
+    df = pd.read_csv(path, sep=";", encoding="utf-8", usecols=usecols)
+    for col, valores in (filtros or {}).items():
+        df = df[df[col].isin(valores)].reset_index(drop=True)
+    return df
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.path.join(BASE_DIR, "data", "cache")
+
+
+def hash_textos(textos) -> np.ndarray:
+    """Hash de 64 bits (BLAKE2b) de cada texto, como arreglo uint64."""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little") for t in textos],
+        dtype=np.uint64,
+    )
+
+
+class CacheVectores:
+    """
+    Caché en disco de vectores float32 por texto, separada por modelo.
+
+    - `vectores.f32`: matriz (n, dim) float32 en bruto, solo se agrega al final
+      y se lee con memory-map.
+    - `hashes.npy`: hash de cada fila; su largo define cuántas filas son válidas.
+    - `meta.json`: modelo, dimensión y segundos promedio por texto calculado.
+    """
+
+    def __init__(self, modelo: str, espacio: str, directorio: str = CACHE_DIR):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", modelo)
+        self.modelo = modelo
+        self.ruta = os.path.join(directorio, espacio, slug)
+        self._vectores = os.path.join(self.ruta, "vectores.f32")
+        self._hashes = os.path.join(self.ruta, "hashes.npy")
+        self._meta = os.path.join(self.ruta, "meta.json")
+        self.meta = self._leer_meta()
+        self.hashes = np.load(self._hashes) if os.path.exists(self._hashes) else np.empty(0, dtype=np.uint64)
+        self._indice = pd.Index(self.hashes)
+
+    def _leer_meta(self) -> dict:
+        if os.path.exists(self._meta):
+            with open(self._meta, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"modelo": self.modelo, "dim": None, "segundos_por_texto": None, "textos_calculados": 0}
+
+    def matriz(self) -> np.ndarray:
+        """Vectores guardados (memory-map de solo lectura), una fila por hash."""
+        if not len(self.hashes):
+            return np.empty((0, self.meta["dim"] or 0), dtype=np.float32)
+        return np.memmap(self._vectores, dtype=np.float32, mode="r", shape=(len(self.hashes), self.meta["dim"]))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def posiciones(self, hashes: np.ndarray) -> np.ndarray:
+        """Fila de cada hash en `matriz()` (-1 si no está en la caché)."""
+        return self._indice.get_indexer(hashes) if len(self.hashes) else np.full(len(hashes), -1)
+
+    def buscar(self, hashes: np.ndarray):
+        """
+        Devuelve (vectores, encontrados): una matriz con las filas halladas en
+        la caché (las demás en cero) y la máscara booleana de aciertos.
+        """
+        posiciones = self.posiciones(hashes)
+        encontrados = posiciones >= 0
+        dim = self.meta["dim"] or 0
+        vectores = np.zeros((len(hashes), dim), dtype=np.float32)
+        if encontrados.any():
+            vectores[encontrados] = self.matriz()[posiciones[encontrados]]
+        return vectores, encontrados
+
+    def agregar(self, hashes: np.ndarray, vectores: np.ndarray, segundos: float = None):
+        """Agrega vectores nuevos (sin duplicados) y actualiza el costo promedio por texto."""
+        if not len(hashes):
+            return
+        vectores = np.ascontiguousarray(vectores, dtype=np.float32)
+        if self.meta["dim"] is None:
+            self.meta["dim"] = int(vectores.shape[1])
+        elif vectores.shape[1] != self.meta["dim"]:
+            raise ValueError(f"Dimensión {vectores.shape[1]} distinta a la de la caché ({self.meta['dim']}).")
+
+        nuevos = ~pd.Index(hashes).duplicated() & (self._indice.get_indexer(hashes) < 0 if len(self.hashes) else True)
+        hashes, vectores = hashes[nuevos], vectores[nuevos]
+
+        os.makedirs(self.ruta, exist_ok=True)
+        # Primero los vectores y después el índice: si algo falla, las filas sin hash se ignoran
+        with open(self._vectores, "r+b" if os.path.exists(self._vectores) else "wb") as f:
+            f.seek(len(self.hashes) * self.meta["dim"] * 4)
+            f.write(vectores.tobytes())
+            f.truncate()
+        self.hashes = np.concatenate([self.hashes, hashes])
+        np.save(self._hashes + ".tmp.npy", self.hashes)
+        os.replace(self._hashes + ".tmp.npy", self._hashes)
+        self._indice = pd.Index(self.hashes)
+
+        if segundos is not None and len(vectores):
+            total = self.meta["textos_calculados"] + len(vectores)
+            previo = (self.meta["segundos_por_texto"] or 0.0) * self.meta["textos_calculados"]
+            self.meta["segundos_por_texto"] = (previo + segundos) / total
+            self.meta["textos_calculados"] = total
+        with open(self._meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(self._meta + ".tmp", self._meta)
+
+
+class VectoresPorFila:
+    """
+    Vectores por fila sin materializar la matriz completa: la fila i es
+    `matriz[posiciones[i]]` (p. ej. el memmap de la caché, con un vector por
+    texto distinto). Al indexar por rango o por índices solo se leen esas
+    filas; `np.asarray` la materializa entera.
+    """
+
+    def __init__(self, matriz: np.ndarray, posiciones: np.ndarray):
+        self.matriz = matriz
+        self.posiciones = np.asarray(posiciones, dtype=np.int64)
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self.posiciones), self.matriz.shape[1])
+
+    @property
+    def dtype(self):
+        return self.matriz.dtype
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def __getitem__(self, filas) -> np.ndarray:
+        return np.asarray(self.matriz[self.posiciones[filas]])
+
+    def __array__(self, dtype=None, copy=None):
+        matriz = self[:]
+        return matriz if dtype is None else matriz.astype(dtype, copy=False)
@@ -0,0 +1,109 @@
+"""
+Benchmark de backends de inferencia NLP en CPU: torch (float32), int8 y onnx.
+
+Cada backend corre en un subproceso aislado (para medir su pico de memoria)
+sobre los comentarios de data/clean_data (fila por fila, sin caché ni
+deduplicación) y reporta tiempo de carga, textos/s de sentimiento y de
+embeddings, pico RSS y la concordancia de etiquetas frente a torch.
+Los backends cuyas dependencias no están instaladas se reportan como error.
+
+Uso:
+    python -m benchmarks.bench_backends [--filas N] [--sentimiento MODELO] [--embeddings MODELO]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.core.config import settings
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEAN_DATA = os.path.join(BASE_DIR, "data", "clean_data")
+
+
+def _worker(backend: str, filas: int, sentimiento: str, embeddings: str, salida: str):
+    """Se ejecuta en el subproceso: carga los modelos del backend, mide e imprime JSON."""
+    from app.application.nlp_service import inferir_sentimiento
+    from app.infrastructure.inference_backends import cargar_clasificador, cargar_codificador
+    from app.infrastructure.storage import leer_tabla
+
+    textos = leer_tabla(CLEAN_DATA, columns=["comentario"])["comentario"].astype(object).fillna("").astype(str)
+    textos = textos.tolist()[:filas or None]
+
+    inicio = time.perf_counter()
+    tokenizer, model = cargar_clasificador(sentimiento, backend)
+    codificador = cargar_codificador(embeddings, backend)
+    t_carga = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    probas = inferir_sentimiento(textos, tokenizer, model)
+    t_sent = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    codificador.encode(textos, batch_size=64)
+    t_emb = time.perf_counter() - inicio
+
+    np.save(salida, probas.argmax(axis=1))
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "textos": len(textos), "carga_s": t_carga,
+        "sentimiento_por_s": len(textos) / t_sent, "embeddings_por_s": len(textos) / t_emb,
+        "peak_rss_mb": peak_kb / 1024,
+    }))
+
+
+def medir(backend: str, args, salida: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_backends", "--worker", backend,
+         "--filas", str(args.filas or 0), "--sentimiento", args.sentimiento,
+         "--embeddings", args.embeddings, "--salida", salida],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"backend": backend, "error": proc.stderr.strip().splitlines()[-1:]}
+    resultado = json.loads(proc.stdout.strip().splitlines()[-1])
+    resultado["backend"] = backend
+    return resultado
+
+
+def main(args):
+    from app.application.nlp_service import EMBEDDING_MODEL, SENTIMENT_MODEL
+
+    args.sentimiento = args.sentimiento or SENTIMENT_MODEL
+    args.embeddings = args.embeddings or EMBEDDING_MODEL
+    print(f"{'backend':>8} | {'carga (s)':>9} | {'sent. textos/s':>14} | {'emb. textos/s':>13} | "
+          f"{'pico RSS (MB)':>13} | {'paridad':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        referencia = None
+        for backend in ("torch", "int8", "onnx"):
+            salida = os.path.join(tmp, f"{backend}.npy")
+            r = medir(backend, args, salida)
+            if "error" in r:
+                print(f"{backend:>8} | error: {r['error']}")
+                continue
+            etiquetas = np.load(salida)
+            if backend == "torch":
+                referencia = etiquetas
+            paridad = float((etiquetas == referencia).mean()) if referencia is not None else float("nan")
+            marca = "" if paridad >= settings.NLP_PARITY_MIN else " (bajo el mínimo)"
+            print(f"{backend:>8} | {r['carga_s']:>9.1f} | {r['sentimiento_por_s']:>14.0f} | "
+                  f"{r['embeddings_por_s']:>13.0f} | {r['peak_rss_mb']:>13.1f} | {paridad:>8.2%}{marca}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worker", default=None)
+    parser.add_argument("--filas", type=int, default=None)
+    parser.add_argument("--sentimiento", default=None)
+    parser.add_argument("--embeddings", default=None)
+    parser.add_argument("--salida", default=None)
+    args = parser.parse_args()
+    if args.worker:
+        _worker(args.worker, args.filas, args.sentimiento, args.embeddings, args.salida)
+    else:
+        main(args)
@@ -0,0 +1,94 @@
+"""
+Lotes fijos de 64 (orden original) vs lotes por largo con presupuesto de tokens.
+
+Puntúa los comentarios de data/original.csv fila por fila (sin deduplicar,
+para medir solo el efecto del armado de lotes) con ambas estrategias en CPU y
+reporta tiempo, tokens útiles por segundo y tokens procesados con padding.
+También corre un corpus de largo mixto (1 de cada 64 comentarios muy largo),
+que es el caso en que el padding fijo más penaliza. Verifica que las etiquetas
+coinciden y que las probabilidades difieren solo por redondeo.
+
+Uso:
+    python -m benchmarks.bench_batching [--modelo NOMBRE_O_RUTA] [--filas N]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from app.application.nlp_service import (
+    SENTIMENT_MAX_LENGTH, SENTIMENT_MODEL, inferir_sentimiento, planificar_lotes
+)
+from app.core.config import settings
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGINAL = os.path.join(BASE_DIR, "data", "original.csv")
+
+
+def inferir_fijo(textos, tokenizer, model, batch_size: int = 64) -> np.ndarray:
+    """Estrategia anterior: lotes de tamaño fijo en el orden original."""
+    probas = []
+    for i in range(0, len(textos), batch_size):
+        with torch.no_grad():
+            inputs = tokenizer(textos[i : i + batch_size], padding=True, truncation=True,
+                               max_length=SENTIMENT_MAX_LENGTH, return_tensors="pt")
+            probas.append(torch.nn.functional.softmax(model(**inputs).logits, dim=1).cpu().numpy())
+    return np.vstack(probas)
+
+
+def tokens_procesados(longitudes, lotes) -> int:
+    return int(sum(len(lote) * max(longitudes[i] for i in lote) for lote in lotes))
+
+
+def medir(nombre, textos, tokenizer, model):
+    longitudes = [len(ids) for ids in
+                  tokenizer(textos, truncation=True, max_length=SENTIMENT_MAX_LENGTH)["input_ids"]]
+    utiles = sum(longitudes)
+    fijos = [list(range(i, min(i + 64, len(textos)))) for i in range(0, len(textos), 64)]
+    por_largo = planificar_lotes(longitudes, settings.SENTIMENT_TOKEN_BUDGET)
+
+    inicio = time.perf_counter()
+    ref = inferir_fijo(textos, tokenizer, model)
+    t_fijo = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    nuevo = inferir_sentimiento(textos, tokenizer, model)
+    t_largo = time.perf_counter() - inicio
+
+    assert (ref.argmax(axis=1) == nuevo.argmax(axis=1)).all(), "Las etiquetas difieren"
+    diferencia = float(np.abs(ref - nuevo).max())
+
+    print(f"\n{nombre}: {len(textos)} textos, {utiles} tokens útiles (diferencia máx. de probabilidad {diferencia:.1e})")
+    print(f"{'estrategia':>12} | {'lotes':>6} | {'tokens c/padding':>16} | {'tiempo (s)':>10} | {'tokens/s':>10}")
+    for etiqueta, lotes, t in (("fijo (64)", fijos, t_fijo), ("por largo", por_largo, t_largo)):
+        print(f"{etiqueta:>12} | {len(lotes):>6} | {tokens_procesados(longitudes, lotes):>16} | "
+              f"{t:>10.2f} | {utiles / t:>10.0f}")
+    print(f"Aceleración: {t_fijo / t_largo:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modelo", default=SENTIMENT_MODEL)
+    parser.add_argument("--filas", type=int, default=None)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    model = AutoModelForSequenceClassification.from_pretrained(args.modelo)
+    model.eval()
+
+    df = pd.read_csv(ORIGINAL, sep=",", encoding="utf-8", nrows=args.filas)
+    columna = next(c for c in df.columns if c.strip().lower() == "comentario")
+    textos = df[columna].fillna("").astype(str).tolist()
+    medir("Corpus de muestra", textos, tokenizer, model)
+
+    largo = " ".join(textos[:40])
+    mixtos = [largo if i % 64 == 0 else t for i, t in enumerate(textos)]
+    medir("Corpus de largo mixto", mixtos, tokenizer, model)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Memoria por columna de clean_data.csv con y sin `category` en columnas de
+baja cardinalidad, y tiempo de limpieza del ETL con y sin categorizar.
+
+Uso:
+    python -m benchmarks.bench_categorias
+"""
+import os
+import time
+
+import pandas as pd
+
+from app.application.data_service import DATA_PATH, categorizar_columnas, limpiar_dataframe
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEAN_PATH = os.path.join(BASE_DIR, "data", "clean_data.csv")
+
+
+def memoria_por_columna():
+    antes = pd.read_csv(CLEAN_PATH, sep=";", encoding="utf-8")
+    despues = categorizar_columnas(antes.copy())
+
+    mem_antes = antes.memory_usage(deep=True, index=False)
+    mem_despues = despues.memory_usage(deep=True, index=False)
+
+    print(f"{'columna':>30} | {'dtype':>8} | {'antes (KB)':>10} | {'después (KB)':>12} | {'reducción':>9}")
+    for col in antes.columns:
+        a, d = mem_antes[col] / 1024, mem_despues[col] / 1024
+        print(f"{col:>30} | {str(despues[col].dtype):>8} | {a:>10.1f} | {d:>12.1f} | {a / d:>8.1f}x")
+    a, d = mem_antes.sum() / 1024, mem_despues.sum() / 1024
+    print(f"{'TOTAL':>30} | {'':>8} | {a:>10.1f} | {d:>12.1f} | {a / d:>8.1f}x")
+
+
+def tiempo_etl(repeticiones: int = 5):
+    crudo = pd.read_csv(DATA_PATH, sep=",", encoding="utf-8")
+
+    tiempos = {}
+    for categorizar in (False, True):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            limpio = limpiar_dataframe(crudo.copy(), categorizar=categorizar)
+        tiempos[categorizar] = (time.perf_counter() - inicio) / repeticiones
+        memoria = limpio.memory_usage(deep=True).sum() / 1024
+        print(f"\nLimpieza ETL {'con' if categorizar else 'sin'} category: "
+              f"{tiempos[categorizar] * 1000:.1f} ms | DataFrame resultante: {memoria:.1f} KB", end="")
+    print()
+
+
+if __name__ == "__main__":
+    memoria_por_columna()
+    tiempo_etl()
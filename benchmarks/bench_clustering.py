@@ -0,0 +1,113 @@
+"""
+Benchmark de agrupación de temas: KMeans en memoria (n_init=10) vs k-means
+por mini-lotes con `partial_fit` por bloques.
+
+Genera embeddings sintéticos (384 dimensiones, como MiniLM, normalizados)
+con N_CLUSTERS grupos en un archivo memory-mapped (como la caché de
+embeddings) y ejecuta cada modo en un subproceso aislado para medir tiempo y
+pico de memoria (RSS). KMeans carga la matriz completa; los mini-lotes leen
+los bloques del memmap a través de `VectoresPorFila`, como el pipeline. La
+calidad se compara con Silhouette sobre una muestra de 10k filas y con la
+concordancia entre ambas particiones (Adjusted Rand Index).
+
+Uso:
+    python -m benchmarks.bench_clustering                # 10k y 100k filas
+    python -m benchmarks.bench_clustering 10000 1000000  # tamaños a medida
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [10_000, 100_000]
+DIM = 384
+MUESTRA_SILHOUETTE = 10_000
+
+
+def generar_embeddings(n_filas: int, n_clusters: int, path: str, bloque: int = 100_000):
+    """Escribe los embeddings en `path` (float32 en bruto) por bloques de filas."""
+    rng = np.random.default_rng(0)
+    centros = rng.normal(size=(n_clusters, DIM)).astype(np.float32)
+    matriz = np.memmap(path, dtype=np.float32, mode="w+", shape=(n_filas, DIM))
+    for inicio in range(0, n_filas, bloque):
+        n = min(bloque, n_filas - inicio)
+        asignacion = rng.integers(0, n_clusters, size=n)
+        emb = centros[asignacion] + rng.normal(scale=1.5, size=(n, DIM)).astype(np.float32)
+        matriz[inicio : inicio + n] = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+    matriz.flush()
+
+
+def _worker(modo: str, n_filas: int, entrada: str, salida: str):
+    """Se ejecuta en el subproceso: agrupa, guarda etiquetas e imprime métricas en JSON."""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
+    from app.application.nlp_service import N_CLUSTERS, ajustar_kmeans_por_bloques, predecir_por_bloques
+    from app.infrastructure.vector_cache import VectoresPorFila
+
+    embeddings = VectoresPorFila(
+        np.memmap(entrada, dtype=np.float32, mode="r", shape=(n_filas, DIM)), np.arange(n_filas)
+    )
+    inicio = time.perf_counter()
+    if modo == "minibatch":
+        modelo = ajustar_kmeans_por_bloques(embeddings, N_CLUSTERS)
+        etiquetas = predecir_por_bloques(modelo, embeddings)
+    else:
+        etiquetas = KMeans(n_clusters=N_CLUSTERS, random_state=42, n_init=10).fit_predict(np.asarray(embeddings))
+    segundos = time.perf_counter() - inicio
+
+    muestra = np.sort(np.random.default_rng(0).choice(n_filas, min(MUESTRA_SILHOUETTE, n_filas), replace=False))
+    sil = silhouette_score(embeddings[muestra], etiquetas[muestra])
+    np.save(salida, etiquetas)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"segundos": segundos, "silhouette": float(sil), "peak_rss_mb": peak_kb / 1024}))
+
+
+def medir(modo: str, n_filas: int, entrada: str, salida: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_clustering", "--worker", modo, str(n_filas), entrada, salida],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"modo": modo, "filas": n_filas, "error": proc.stderr.strip().splitlines()[-1:]}
+    resultado = json.loads(proc.stdout.strip().splitlines()[-1])
+    resultado.update({"modo": modo, "filas": n_filas})
+    return resultado
+
+
+def main(sizes):
+    from sklearn.metrics import adjusted_rand_score
+
+    from app.application.nlp_service import N_CLUSTERS
+
+    print(f"{'filas':>10} | {'modo':>9} | {'tiempo (s)':>10} | {'pico RSS (MB)':>13} | {'silhouette':>10} | {'ARI':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            entrada = os.path.join(tmp, f"embeddings_{n}.f32")
+            generar_embeddings(n, N_CLUSTERS, entrada)
+            etiquetas = {}
+            for modo in ("kmeans", "minibatch"):
+                salida = os.path.join(tmp, f"{modo}_{n}.npy")
+                r = medir(modo, n, entrada, salida)
+                if "error" in r:
+                    print(f"{n:>10} | {modo:>9} | error: {r['error']}")
+                    continue
+                etiquetas[modo] = np.load(salida)
+                ari = (adjusted_rand_score(etiquetas["kmeans"], etiquetas[modo])
+                       if "kmeans" in etiquetas else float("nan"))
+                print(f"{n:>10} | {modo:>9} | {r['segundos']:>10.2f} | {r['peak_rss_mb']:>13.1f} | "
+                      f"{r['silhouette']:>10.3f} | {ari:>5.2f}")
+            os.remove(entrada)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        _worker(sys.argv[2], int(sys.argv[3]), sys.argv[4], sys.argv[5])
+    else:
+        main([int(x) for x in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,83 @@
+"""
+Benchmark del ETL: modo completo (en memoria) vs modo por bloques.
+
+Genera archivos sintéticos replicando data/original.csv y ejecuta cada modo
+en un subproceso aislado para medir el pico de memoria (RSS) y filas/s.
+
+Uso:
+    python -m benchmarks.bench_etl                 # 10k, 1M y 10M filas
+    python -m benchmarks.bench_etl 10000 1000000   # tamaños a medida
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGINAL = os.path.join(BASE_DIR, "data", "original.csv")
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+CHUNKSIZE = 100_000
+
+
+def generar_sintetico(n_filas: int, path: str):
+    """Replica las filas de original.csv (con IDs nuevos) hasta n_filas."""
+    with open(ORIGINAL, "r", encoding="utf-8") as f:
+        header = f.readline()
+        filas = [line.split(",", 1)[1] for line in f if line.strip()]
+
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(header)
+        for i in range(n_filas):
+            out.write(f"{i + 1},{filas[i % len(filas)]}")
+
+
+def _worker(modo: str, input_path: str, output_path: str):
+    """Se ejecuta en el subproceso: corre el ETL e imprime métricas en JSON."""
+    from app.application.data_service import run_etl
+
+    chunksize = CHUNKSIZE if modo == "streaming" else None
+    inicio = time.perf_counter()
+    run_etl(chunksize=chunksize, input_path=input_path, output_path=output_path)
+    segundos = time.perf_counter() - inicio
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"segundos": segundos, "peak_rss_mb": peak_kb / 1024}))
+
+
+def medir(modo: str, n_filas: int, input_path: str, output_path: str) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_etl", "--worker", modo, input_path, output_path],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"modo": modo, "filas": n_filas, "error": proc.stderr.strip().splitlines()[-1:]}
+    resultado = json.loads(proc.stdout.strip().splitlines()[-1])
+    resultado.update({"modo": modo, "filas": n_filas,
+                      "filas_por_s": n_filas / resultado["segundos"]})
+    return resultado
+
+
+def main(sizes):
+    print(f"{'filas':>10} | {'modo':>9} | {'tiempo (s)':>10} | {'filas/s':>10} | {'pico RSS (MB)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            input_path = os.path.join(tmp, f"original_{n}.csv")
+            output_path = os.path.join(tmp, f"clean_{n}.csv")
+            generar_sintetico(n, input_path)
+            for modo in ("completo", "streaming"):
+                r = medir(modo, n, input_path, output_path)
+                if "error" in r:
+                    print(f"{n:>10} | {modo:>9} | error: {r['error']}")
+                    continue
+                print(f"{n:>10} | {modo:>9} | {r['segundos']:>10.2f} | "
+                      f"{r['filas_por_s']:>10.0f} | {r['peak_rss_mb']:>13.1f}")
+            os.remove(input_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        _worker(*sys.argv[2:5])
+    else:
+        main([int(x) for x in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,44 @@
+"""
+Tiempos del motor de gráficos del dashboard: corrida en frío en un proceso,
+en frío repartida entre procesos y repetida sin cambios en los datos (solo
+lee las tablas y compara huellas). Las imágenes se escriben en una carpeta
+temporal; la huella de esa carpeta se descarta al terminar.
+
+Uso:
+    python -m benchmarks.bench_graficos [procesos]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from app.application.visual_service import (
+    _guardar_cache_graficos, _leer_cache_graficos, generar_todos_los_graficos
+)
+
+
+def medir(output_dir: str, **kwargs) -> float:
+    inicio = time.perf_counter()
+    generar_todos_los_graficos(output_dir, **kwargs)
+    return time.perf_counter() - inicio
+
+
+def main(workers: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        tiempos = {
+            "frío, 1 proceso": medir(tmp, forzar=True, workers=1),
+            f"frío, {workers} procesos": medir(tmp, forzar=True, workers=workers),
+            "sin cambios": medir(tmp),
+        }
+        cache = _leer_cache_graficos()
+        cache.pop(os.path.abspath(tmp), None)
+        _guardar_cache_graficos(cache)
+
+    print(f"\n{'corrida':>20} | {'tiempo (s)':>10}")
+    for nombre, segundos in tiempos.items():
+        print(f"{nombre:>20} | {segundos:>10.2f}")
+    print(f"Núcleos disponibles: {os.cpu_count()}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1))
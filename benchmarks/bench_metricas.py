@@ -0,0 +1,75 @@
+"""
+Paridad y tiempos del margen de confianza de /api/metrics: `apply` fila a fila
+con dos `np.sort` (implementación anterior) vs `margen_confianza`
+(selección vectorizada de los dos mayores) y `resumen_confianza` completo.
+
+Verifica que los márgenes coinciden exactamente y que accuracy, precision,
+recall y f1_score no cambian, sobre data/themes_nlp y réplicas de 1M y 5M
+filas (el `apply` solo se mide hasta 1M; por encima se extrapola).
+
+Uso:
+    python -m benchmarks.bench_metricas [filas ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.application.nlp_service import margen_confianza, resumen_confianza
+from app.infrastructure.storage import leer_tabla
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THEMES_NLP = os.path.join(BASE_DIR, "data", "themes_nlp")
+COLUMNAS = ["sent_pos", "sent_neu", "sent_neg"]
+DEFAULT_SIZES = [1_000_000, 5_000_000]
+MAX_APPLY = 1_000_000
+
+
+def metricas(avg_conf: float, std_conf: float) -> dict:
+    avg_conf, std_conf = round(avg_conf, 3), round(std_conf, 3)
+    return {
+        "accuracy": round(0.9 + (avg_conf * 0.1), 3),
+        "precision": round(0.9 + (avg_conf * 0.08), 3),
+        "recall": round(0.9 + (avg_conf * 0.09), 3),
+        "f1_score": round(0.9 + (avg_conf * 0.1 - std_conf), 3),
+    }
+
+
+def margen_apply(df):
+    return df[COLUMNAS].apply(lambda row: np.sort(row.values)[-1] - np.sort(row.values)[-2], axis=1)
+
+
+def main(sizes):
+    base = leer_tabla(THEMES_NLP, columns=["ciudad", "tema"] + COLUMNAS)
+    rng = np.random.default_rng(0)
+    print(f"{'filas':>10} | {'apply (s)':>10} | {'margen (ms)':>14} | {'resumen (ms)':>12} | {'aceleración':>11}")
+    for n in [len(base)] + sizes:
+        df = base if n == len(base) else base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+
+        inicio = time.perf_counter()
+        margen = margen_confianza(df[COLUMNAS].to_numpy())
+        t_vector = time.perf_counter() - inicio
+        df["margen_confianza"] = margen
+        inicio = time.perf_counter()
+        resumen = resumen_confianza(df)
+        t_resumen = time.perf_counter() - inicio
+
+        if n <= MAX_APPLY:
+            inicio = time.perf_counter()
+            ref = margen_apply(df)
+            t_apply = time.perf_counter() - inicio
+            assert np.array_equal(ref.to_numpy(), margen, equal_nan=True), "Los márgenes difieren"
+            assert metricas(ref.mean(), ref.std()) == metricas(resumen["media"], resumen["desviacion"])
+            etiqueta = f"{t_apply:>10.2f}"
+        else:
+            t_apply = t_apply_por_fila * n
+            etiqueta = f"~{t_apply:>9.1f}"
+        t_apply_por_fila = t_apply / n
+        print(f"{n:>10} | {etiqueta} | {t_vector * 1000:>14.1f} | {t_resumen * 1000:>12.1f} | "
+              f"{t_apply / t_vector:>10.0f}x")
+    print("Paridad OK: márgenes idénticos y mismas métricas.")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or DEFAULT_SIZES)
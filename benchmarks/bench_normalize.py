@@ -0,0 +1,71 @@
+"""
+Paridad y tiempos: `normalize_text` celda a celda vs `normalize_series`.
+
+Verifica que ambas rutas producen exactamente el mismo texto (sobre
+data/original.csv y un conjunto de casos límite) y compara tiempos en la
+muestra de 10k filas y en réplicas más grandes para comprobar escalado lineal.
+
+Uso:
+    python -m benchmarks.bench_normalize
+"""
+import os
+import time
+
+import pandas as pd
+
+from app.application.data_service import normalize_series, normalize_text
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGINAL = os.path.join(BASE_DIR, "data", "original.csv")
+
+CASOS_LIMITE = [
+    "", "   ", "nan", "Ñandú  ÁRBOL", "café\tcon\nleche", "İstanbul", "ﬁnal ½ ²",
+    "emoji 😀 fin", "¿Qué pasó?!", "  espacios   múltiples  ", "100% (urgente)",
+    "ß straße", "Ａｎｃｈｏ completo", "a b c", None, 3.5, 42,
+]
+
+
+def verificar_paridad(serie: pd.Series):
+    esperado = serie.astype(str).apply(normalize_text)
+    obtenido = normalize_series(serie)
+    assert esperado.index.equals(obtenido.index)
+    diferencias = (esperado != obtenido).sum()
+    assert diferencias == 0, f"{diferencias} valores difieren"
+
+
+def medir(serie: pd.Series):
+    inicio = time.perf_counter()
+    serie.astype(str).apply(normalize_text)
+    t_apply = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    normalize_series(serie)
+    t_vector = time.perf_counter() - inicio
+    return t_apply, t_vector
+
+
+def main():
+    df = pd.read_csv(ORIGINAL, sep=",", encoding="utf-8")
+    columnas = [c for c in df.columns if df[c].dtype == "object"]
+
+    # 1 Paridad
+    verificar_paridad(pd.Series(CASOS_LIMITE, dtype=object))
+    verificar_paridad(pd.Series([], dtype=object))
+    for col in columnas:
+        verificar_paridad(df[col])
+    print(f"Paridad OK en {len(columnas)} columnas y {len(CASOS_LIMITE)} casos límite.")
+
+    # 2 Tiempos (todas las columnas de texto, como en el ETL)
+    print(f"{'filas':>10} | {'apply (s)':>10} | {'vectorizado (s)':>15} | {'aceleración':>11}")
+    for factor in (1, 10, 100):
+        grande = pd.concat([df] * factor, ignore_index=True) if factor > 1 else df
+        t_apply = t_vector = 0.0
+        for col in columnas:
+            a, v = medir(grande[col])
+            t_apply += a
+            t_vector += v
+        print(f"{len(grande):>10} | {t_apply:>10.3f} | {t_vector:>15.3f} | {t_apply / t_vector:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Paridad y tiempos: `limpiar_texto` fila a fila vs `limpiar_comentarios`.
+
+Verifica que ambas rutas producen exactamente el mismo `comentario_limpio`
+(sobre data/original.csv, la salida del ETL y casos límite; `desde_etl=True`
+solo sobre texto ya normalizado por el ETL) y compara tiempos en 1M filas con
+los comentarios de la muestra (muy repetidos) y con comentarios casi todos
+distintos (peor caso para la deduplicación).
+
+Uso:
+    python -m benchmarks.bench_preparar
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.application.data_service import normalize_series
+from app.application.nlp_service import cargar_stopwords, limpiar_comentarios, limpiar_texto
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGINAL = os.path.join(BASE_DIR, "data", "original.csv")
+FILAS = 1_000_000
+
+CASOS_LIMITE = [
+    "", "   ", "Hola, MUNDO!!", "123 calles 45b", "año 2024: ¿qué pasó?", "el la de y",
+    "tab\tseparado\ny salto", "guion_bajo y-guion", "emoji 😀 fin", None, np.nan,
+]
+
+
+def verificar_paridad(serie: pd.Series, stop_words: set, desde_etl: bool = False):
+    esperado = serie.astype(object).apply(lambda t: limpiar_texto(t, stop_words))
+    obtenido = limpiar_comentarios(serie, stop_words, desde_etl)
+    assert esperado.index.equals(obtenido.index)
+    diferencias = (esperado != obtenido).sum()
+    assert diferencias == 0, f"{diferencias} valores difieren"
+
+
+def medir(serie: pd.Series, stop_words: set, desde_etl: bool):
+    inicio = time.perf_counter()
+    serie.astype(object).apply(lambda t: limpiar_texto(t, stop_words))
+    t_apply = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    limpiar_comentarios(serie, stop_words, desde_etl)
+    t_vector = time.perf_counter() - inicio
+    return t_apply, t_vector
+
+
+def main():
+    stop_words = cargar_stopwords()
+    df = pd.read_csv(ORIGINAL, sep=",", encoding="utf-8")
+    crudo = df[next(c for c in df.columns if c.strip().lower() == "comentario")]
+    etl = normalize_series(crudo)
+
+    # 1 Paridad
+    verificar_paridad(pd.Series(CASOS_LIMITE, dtype=object), stop_words)
+    verificar_paridad(normalize_series(pd.Series(CASOS_LIMITE, dtype=object)), stop_words, desde_etl=True)
+    verificar_paridad(pd.Series([], dtype=object), stop_words)
+    verificar_paridad(crudo, stop_words)
+    verificar_paridad(etl, stop_words, desde_etl=True)
+    verificar_paridad(etl.astype("category"), stop_words, desde_etl=True)
+    print(f"Paridad OK en {len(crudo)} comentarios (crudos y del ETL) y {len(CASOS_LIMITE)} casos límite.")
+
+    # 2 Tiempos en 1M filas
+    rng = np.random.default_rng(0)
+    repetidos = pd.Series(etl.to_numpy()[rng.integers(0, len(etl), FILAS)])
+    palabras = np.array(" ".join(etl.unique()).split() + list(stop_words)[:50])
+    distintos = pd.Series([" ".join(rng.choice(palabras, 8)) for _ in range(FILAS)])
+
+    print(f"{'corpus (1M filas)':>22} | {'distintos':>9} | {'apply (s)':>10} | {'vectorizado (s)':>15} | {'aceleración':>11}")
+    for nombre, serie in (("muestra repetida", repetidos), ("casi todos distintos", distintos)):
+        t_apply, t_vector = medir(serie, stop_words, desde_etl=True)
+        print(f"{nombre:>22} | {serie.nunique():>9} | {t_apply:>10.2f} | {t_vector:>15.2f} | {t_apply / t_vector:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
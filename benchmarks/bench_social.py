@@ -0,0 +1,100 @@
+"""
+Paridad y tiempos de la agregación social: groupby por filas (implementación
+anterior) vs `agregados_por_ciudad` (una pasada con `np.bincount`).
+
+Verifica que los patrones y el índice de impacto son idénticos y que los
+promedios por ciudad coinciden salvo redondeo de punto flotante, sobre
+data/clean_data y réplicas de 1M y 10M filas. También comprueba que sumar
+estadísticos por bloques equivale a calcularlos de una vez y mide lo que
+tarda la API en derivar patrones desde la tabla de estadísticos.
+
+Uso:
+    python -m benchmarks.bench_social [filas ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.application.social_module import (
+    BASE_COLS, agregados_desde_estadisticos, agregados_por_ciudad, analyze_social_patterns, clasificar_patrones,
+    estadisticos_por_ciudad, indice_desde_agregados, load_dataset, normalize_data, sumar_estadisticos
+)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLEAN_DATA = os.path.join(BASE_DIR, "data", "clean_data.csv")
+DEFAULT_SIZES = [1_000_000, 10_000_000]
+
+
+def agregados_groupby(df: pd.DataFrame) -> pd.DataFrame:
+    """Referencia: normalización fila a fila y un groupby con promedios."""
+    df = normalize_data(df.copy())
+    df["vulnerabilidad"] = (
+        (1 - df["acceso_a_internet"]) * 0.4 +
+        (1 - df["atencion_previa_del_gobierno"]) * 0.3 +
+        df["zona_rural"] * 0.3
+    )
+    agregados = df.groupby("ciudad", dropna=True, observed=True).agg(
+        vulnerabilidad=("vulnerabilidad", "mean"),
+        nivel_de_urgencia=("nivel_de_urgencia", "mean"),
+        n_reportes=("id", "count"),
+        **{col: (col, "mean") for col in BASE_COLS}
+    ).reset_index()
+    agregados["ciudad"] = agregados["ciudad"].astype(object)
+    return agregados.sort_values("ciudad").reset_index(drop=True)
+
+
+def comparar(df: pd.DataFrame):
+    inicio = time.perf_counter()
+    ref = agregados_groupby(df)
+    t_ref = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    nuevo = agregados_por_ciudad(df)
+    t_nuevo = time.perf_counter() - inicio
+
+    assert ref["ciudad"].equals(nuevo["ciudad"]) and ref["n_reportes"].equals(nuevo["n_reportes"])
+    numericas = ref.columns.drop(["ciudad", "n_reportes"])
+    diferencia = float((ref[numericas] - nuevo[numericas]).abs().max().max())
+    assert diferencia < 1e-9, f"Promedios difieren en {diferencia}"
+    assert clasificar_patrones(ref).equals(clasificar_patrones(nuevo)), "Los patrones difieren"
+    assert indice_desde_agregados(ref).equals(indice_desde_agregados(nuevo)), "El índice difiere"
+    return t_ref, t_nuevo, diferencia
+
+
+def comparar_incremental(df: pd.DataFrame, bloques: int = 4):
+    """Suma de estadísticos por bloques (ingesta incremental) vs una sola pasada."""
+    cortes = np.linspace(0, len(df), bloques + 1).astype(int)
+    incremental = sumar_estadisticos(*(estadisticos_por_ciudad(df.iloc[i:j]) for i, j in zip(cortes, cortes[1:])))
+    completo = agregados_desde_estadisticos(estadisticos_por_ciudad(df))
+    incremental = agregados_desde_estadisticos(incremental)
+    assert clasificar_patrones(incremental).equals(clasificar_patrones(completo)), "Patrones incrementales difieren"
+    assert indice_desde_agregados(incremental).equals(indice_desde_agregados(completo)), "Índice incremental difiere"
+
+
+def medir_respuesta(df: pd.DataFrame, repeticiones: int = 20) -> float:
+    """Milisegundos por llamada a `analyze_social_patterns` sobre la tabla de estadísticos."""
+    estadisticos = estadisticos_por_ciudad(df)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        analyze_social_patterns(estadisticos)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main(sizes):
+    base = load_dataset(CLEAN_DATA)
+    rng = np.random.default_rng(0)
+    print(f"{'filas':>10} | {'groupby (s)':>11} | {'bincount (s)':>12} | {'aceleración':>11} | {'dif. máx.':>9} | "
+          f"{'API (ms)':>8}")
+    for n in [len(base)] + sizes:
+        df = base if n == len(base) else base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+        t_ref, t_nuevo, diferencia = comparar(df)
+        comparar_incremental(df)
+        print(f"{n:>10} | {t_ref:>11.2f} | {t_nuevo:>12.2f} | {t_ref / t_nuevo:>10.1f}x | {diferencia:>9.1e} | "
+              f"{medir_respuesta(df):>8.2f}")
+    print("Paridad OK: patrones e índice idénticos (también sumando por bloques).")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or DEFAULT_SIZES)
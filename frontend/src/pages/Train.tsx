@@ -8,6 +8,7 @@ import { toast } from "sonner";
 
 export default function Train() {
   const [isTraining, setIsTraining] = useState(false);
+  const [trainStage, setTrainStage] = useState<string | null>(null);
   const [trainStatus, setTrainStatus] = useState<"idle" | "success" | "error">("idle");
   const [kpis, setKpis] = useState({
     total_registros: 0,
@@ -16,17 +17,26 @@ export default function Train() {
     temas_identificados: 0,
   });
 
-  // 🔹 Ejecuta el pipeline y luego actualiza los KPIs
+  // 🔹 Encola el pipeline, espera a que termine la corrida y luego actualiza los KPIs
   const handleTrain = async () => {
     setIsTraining(true);
     setTrainStatus("idle");
+    setTrainStage(null);
 
     try {
       const response = await apiService.runPipeline();
+      const job = await apiService.waitForJob(response.job_id, (estado) =>
+        setTrainStage(estado.etapa_actual),
+      );
+      if (job.estado === "error") {
+        throw new Error(job.error || "La corrida del pipeline terminó con error");
+      }
       setTrainStatus("success");
 
       toast.success("Entrenamiento completado", {
-        description: response.message || "El modelo se ha entrenado exitosamente",
+        description: job.segundos != null
+          ? `El modelo se ha entrenado exitosamente en ${job.segundos.toFixed(1)} s`
+          : "El modelo se ha entrenado exitosamente",
       });
 
       // ✅ Al finalizar, obtener KPIs actualizados
@@ -40,6 +50,7 @@ export default function Train() {
       });
     } finally {
       setIsTraining(false);
+      setTrainStage(null);
     }
   };
 
@@ -93,7 +104,10 @@ export default function Train() {
 
           {/* Action button */}
           {isTraining ? (
-            <Loader text="Entrenando modelo..." size="lg" />
+            <Loader
+              text={trainStage ? `Entrenando modelo (etapa: ${trainStage})...` : "Entrenando modelo..."}
+              size="lg"
+            />
           ) : (
             <Button
               onClick={handleTrain}
@@ -4,8 +4,25 @@ const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000
 export interface TrainResponse {
   status: string;
   message: string;
+  job_id: string;
+  status_url: string;
+  coalesced?: boolean;
+  job?: JobResponse;
 }
 
+export interface JobResponse {
+  id: string;
+  estado: "en_cola" | "ejecutando" | "completado" | "error";
+  etapa_actual: string | null;
+  progreso: number;
+  segundos: number | null;
+  error: string | null;
+  [key: string]: any;
+}
+
+// Intervalo entre consultas del estado de una corrida del pipeline
+const JOB_POLL_INTERVAL_MS = 2000;
+
 export interface MetricsResponse {
   accuracy?: number;
   precision?: number;
@@ -41,6 +58,37 @@ class ApiService {
     return response.json();
   }
 
+  async getJob(jobId: string): Promise<JobResponse> {
+    const response = await fetch(`${this.baseUrl}/api/jobs/${jobId}`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`Error al consultar el entrenamiento: ${response.statusText}`);
+    }
+
+    return response.json();
+  }
+
+  // Consulta /api/jobs/{id} hasta que la corrida termina ("completado" o "error")
+  async waitForJob(
+    jobId: string,
+    onProgress?: (job: JobResponse) => void,
+    intervalMs: number = JOB_POLL_INTERVAL_MS,
+  ): Promise<JobResponse> {
+    while (true) {
+      const job = await this.getJob(jobId);
+      onProgress?.(job);
+      if (job.estado === 'completado' || job.estado === 'error') {
+        return job;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  }
+
   async getMetrics(): Promise<MetricsResponse> {
     const response = await fetch(`${this.baseUrl}/api/metrics`, {
       method: 'GET',